@@ -1,5 +1,22 @@
+import numpy as np
+
+MIDI_NOTES = 128
+DEFAULT = 0  # Colour codes: the key's own white or black
+ACTIVE = 1  # The active colour; higher codes are highlight colours
+
+
 class KeyColorManager:
-    def __init__(self, canvas, white_keys, black_keys, starting_midi_note):
+    """Colours the keys of the keyboard canvas.
+
+    Key state lives in arrays indexed by MIDI number: which keys are active
+    and which highlight colour each has. Changing state only marks a frame
+    as due. At most fps times a second, render_frame() compares the colour
+    each key should have with the one it shows. It then calls itemconfig
+    for the keys that differ. A flood of /keyOn and /keyOff messages
+    therefore costs at most one canvas update per changed key per frame.
+    """
+
+    def __init__(self, canvas, white_keys, black_keys, starting_midi_note, fps=60):
         self.canvas = canvas
         self.white_keys = white_keys
         self.black_keys = black_keys
@@ -8,44 +25,105 @@ class KeyColorManager:
         self.highlight_color = 'blue'  # Color for highlighting keys in the current scale
         self.active_color = 'yellow'  # Color for active keys
         self.starting_midi_note = starting_midi_note
-        self.highlighted_keys = set()  # Track highlighted keys by their MIDI numbers
+        self.palette = [None, self.active_color]  # Colour of each code; DEFAULT depends on the key
+        self.active = np.zeros(MIDI_NOTES, dtype=bool)
+        self.highlights = np.zeros(MIDI_NOTES, dtype='u1')  # Highlight colour code per key, DEFAULT if none
+        self.frame_interval = 1
+        self.set_frame_rate(fps)
+        self.frame_pending = False
+        self.map_keys()
+
+    def set_frame_rate(self, fps):
+        """Repaint at most fps times a second."""
+        self.frame_interval = max(int(1000 / fps), 1)
+
+    def map_keys(self):
+        """Look up the canvas item of every MIDI number; the keys are assumed to show their default colours."""
+        self.items = np.zeros(MIDI_NOTES, dtype=int)  # Canvas item per MIDI number, 0 if not on the keyboard
+        self.is_black = np.zeros(MIDI_NOTES, dtype=bool)
+        for midi_number in range(MIDI_NOTES):
+            index, is_black = self.find_key_index(midi_number)
+            key_list = self.black_keys if is_black else self.white_keys
+            if 0 <= index < len(key_list):
+                self.items[midi_number] = key_list[index]
+                self.is_black[midi_number] = is_black
+        self.shown = np.full(MIDI_NOTES, DEFAULT, dtype='u1')  # Colour code each key currently has
+
+    @property
+    def highlighted_keys(self):
+        """MIDI numbers of the highlighted keys; assigning a set highlights those keys instead."""
+        return set(np.flatnonzero(self.highlights).tolist())
+
+    @highlighted_keys.setter
+    def highlighted_keys(self, midi_numbers):
+        self.highlights[:] = DEFAULT
+        for midi_number in midi_numbers:
+            self.highlight_key(midi_number)
+        self.request_frame()
+
+    def color_code(self, color):
+        if color not in self.palette:
+            self.palette.append(color)
+        return self.palette.index(color)
 
     def highlight_key(self, midi_number, color=None):
         """Highlight a key with the given color or the default highlight color."""
         color = color or self.highlight_color  # Use provided color or default to highlight color
-        index, is_black = self.find_key_index(midi_number)
-        if index is not None:
-            key_list = self.black_keys if is_black else self.white_keys
-            self.canvas.itemconfig(key_list[index], fill=color)
-            self.highlighted_keys.add(midi_number)
-            
+        if 0 <= midi_number < MIDI_NOTES:
+            self.highlights[midi_number] = self.color_code(color)
+            self.request_frame()
+
     def reset_highlighted_keys(self):
         """Reset all highlighted keys to their default color."""
-        for midi_number in self.highlighted_keys:
-            self.reset_key_color(midi_number)
-        self.highlighted_keys.clear()
+        self.highlights[:] = DEFAULT
+        self.request_frame()
 
     def reset_key_color(self, midi_number):
         """Reset a key's color to its default."""
-        index, is_black = self.find_key_index(midi_number)
-        if index is not None:
-            default_color = self.default_black_key_color if is_black else self.default_white_key_color
-            key_list = self.black_keys if is_black else self.white_keys
-            self.canvas.itemconfig(key_list[index], fill=default_color)
+        if 0 <= midi_number < MIDI_NOTES:
+            self.active[midi_number] = False
+            self.highlights[midi_number] = DEFAULT
+            self.request_frame()
+
+    def reset_colors(self):
+        """Return every key to its default color."""
+        self.active[:] = False
+        self.reset_highlighted_keys()
+
+    def activate_key(self, midi_number):
+        """Activate a key, changing its color to active color."""
+        if 0 <= midi_number < MIDI_NOTES:
+            self.active[midi_number] = True
+            self.request_frame()
 
     def deactivate_key(self, midi_number):
-        """Deactivate a key, ensuring it returns to its highlighted color if it was highlighted, or its default color otherwise."""
-        if midi_number in self.highlighted_keys:
-            # The key is part of the current scale and should remain highlighted
-            self.highlight_key(midi_number, self.highlight_color)
-        else:
-            # The key is not part of the current scale and should revert to its default color
-            self.reset_key_color(midi_number)
+        """Deactivate a key; it shows its highlight color if it is highlighted, or its default color otherwise."""
+        if 0 <= midi_number < MIDI_NOTES:
+            self.active[midi_number] = False
+            self.request_frame()
+
+    def request_frame(self):
+        if not self.frame_pending:
+            self.frame_pending = True
+            self.canvas.after(self.frame_interval, self.render_frame)
+
+    def render_frame(self):
+        """Repaint the keys whose colour changed since the last frame."""
+        self.frame_pending = False
+        wanted = np.where(self.active, ACTIVE, self.highlights)
+        for midi_number in np.flatnonzero((wanted != self.shown) & (self.items > 0)).tolist():
+            code = wanted[midi_number]
+            if code == DEFAULT:
+                color = self.default_black_key_color if self.is_black[midi_number] else self.default_white_key_color
+            else:
+                color = self.palette[code]
+            self.canvas.itemconfig(int(self.items[midi_number]), fill=color)
+        self.shown = wanted
 
     def find_key_index(self, midi_number):
         """
         Finds the index of the key associated with a given MIDI number.
-        
+
         Args:
         midi_number (int): The MIDI number of the note.
 
@@ -77,37 +155,20 @@ class KeyColorManager:
             total_white_keys_before = complete_sets * len(white_key_indices) + white_key_position
             return total_white_keys_before, False
 
-    def activate_key(self, midi_number):
-        """Activate a key, changing its color to active color."""
-        index, is_black = self.find_key_index(midi_number)
-        if index is not None:
-            key_list = self.black_keys if is_black else self.white_keys
-            self.canvas.itemconfig(key_list[index], fill=self.active_color)
-            # Note: Do not add to highlighted_keys here as this is for active state
-
     # Example of updating highlighted keys when changing scale
     def change_scale(self, new_scale_notes):
-        self.highlighted_keys.clear()  # Clear the current set of highlighted keys
-        for note in new_scale_notes:
-            # Assuming new_scale_notes is a list of MIDI numbers for the new scale
-            self.highlighted_keys.add(note)  # Add the MIDI number to the highlighted set
-        # You might need to refresh the keyboard visualization here
+        # Assuming new_scale_notes is a list of MIDI numbers for the new scale
+        self.highlighted_keys = new_scale_notes
 
     def update_scale(self, scale_midi_numbers):
-        """Update the set of highlighted keys based on the new scale."""
-        self.highlighted_keys.clear()  # Clear the current highlights
-        self.highlighted_keys.update(scale_midi_numbers)  # Add the new scale's MIDI numbers
-        
-        # Re-highlight keys based on the new scale
-        for midi_number in scale_midi_numbers:
-            self.highlight_key(midi_number)
-        # Optionally, reset any keys that are no longer highlighted
-        self.reset_non_highlighted_keys()
-
+        """Highlight exactly the keys of the new scale; the others return to their default color."""
+        self.highlighted_keys = scale_midi_numbers
 
     def update_keys(self, white_keys, black_keys):
         """Updates the white and black keys managed by this KeyColorManager."""
         self.white_keys = white_keys
         self.black_keys = black_keys
         # Optionally, reset highlighted keys if the keyboard layout changes
-        self.highlighted_keys.clear()
+        self.highlights[:] = DEFAULT
+        self.map_keys()
+        self.request_frame()
@@ -1,9 +1,21 @@
+import time
+STARTED = time.perf_counter()  # Reported as the startup time once the window is up
+import os
+import sys
 import tkinter as tk
-from pythonosc import dispatcher, osc_server, udp_client
+from pythonosc import dispatcher, osc_bundle_builder
 from circle_fifths import CircleOfFifths
 from music_theory import MusicTheory
 from key_color import KeyColorManager
-import threading
+from note_ring import NoteRing
+
+# The OSC engine is shared with the music21 app, whose modules live in ../music21
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'music21'))
+from osc_bundles import build_bundle
+from osc_engine import OscEngine
+from osc_trace import LatencyTracer, split_trace
+
+FORWARD_BUNDLE_SIZE = 64  # Messages per forwarded bundle, well within one datagram
 
 
 class PianoApp:
@@ -30,8 +42,9 @@ class PianoApp:
         # Initialize keyboard size and related attributes before drawing the piano
         # Default to 88 keys, you can adjust this as needed
         self.set_keyboard_size(61)
+        # Key colours are repainted once per frame, however many key messages arrive in between
         self.key_color_manager = KeyColorManager(
-            self.canvas, self.white_keys, self.black_keys, self.starting_midi_note)
+            self.canvas, self.white_keys, self.black_keys, self.starting_midi_note, fps=60)
 
         self.setup_osc()
 
@@ -119,9 +132,9 @@ class PianoApp:
         print(f"Key changed from {old_key} to {selected_key}")
         self.reset_keyboard_colors()
 
-        # Calculate the MIDI notes for the current scale and key
-        scale_notes = MusicTheory.get_scale_notes(selected_key, self.current_scale.get())
-        midi_notes = self.convert_scale_notes_to_midi(scale_notes, selected_key)
+        # Look up the MIDI notes for the current scale and key
+        midi_notes = MusicTheory.get_scale_midi_numbers(
+            selected_key, self.current_scale.get(), self.starting_midi_note, self.keyboard_size)
 
         # Update the KeyColorManager with the current scale's MIDI notes
         self.key_color_manager.highlighted_keys = set(midi_notes)
@@ -130,22 +143,15 @@ class PianoApp:
         self.visualize_scale_on_keyboard()
 
     def KeyColorManager_keys_for_notes(self, midi_notes):
-        # Ensure previous highlights are cleared
-        self.key_color_manager.reset_highlighted_keys()
-
         # Debugging output
         print(
             f"Debug: Highlighting MIDI notes across the keyboard: {midi_notes}")
 
-        # Highlight keys for all MIDI notes
-        for midi_note in midi_notes:
-            self.key_color_manager.highlight_key(midi_note)
+        # Highlight exactly these keys; previous highlights are cleared in the same frame
+        self.key_color_manager.update_scale(midi_notes)
 
     def reset_keyboard_colors(self):
-        for key in self.white_keys:
-            self.canvas.itemconfig(key, fill='white')
-        for key in self.black_keys:
-            self.canvas.itemconfig(key, fill='black')
+        self.key_color_manager.reset_colors()
 
     def setup_osc(self):
         # Setup the dispatcher
@@ -153,35 +159,85 @@ class PianoApp:
         disp.map("/keyOn", self.key_on_handler)
         disp.map("/keyOff", self.key_off_handler)
 
-        # Setup the OSC server
-        server = osc_server.ThreadingOSCUDPServer(('127.0.0.1', 57121), disp)
-        server_thread = threading.Thread(target=server.serve_forever)
-        server_thread.start()
+        # Handlers run on the shared OSC engine's loop. They push key events into a ring
+        # that Tk drains once per frame, and batch the forwards to keyboard_listener.py
+        self.osc_engine = OscEngine.shared()
+        # Latency of traced messages arriving here; their trace is passed on to keyboard_listener.py
+        self.tracer = LatencyTracer('piano', self.osc_engine, dump_interval=10)
+        self.tracer.serve(disp)
+        self.note_ring = NoteRing()
+        self.forward_pending = []  # (address, args) to forward at the end of this loop iteration
+        self.log_interval = 1.0  # Seconds between key log lines
+        self.logged_events = 0
+        self.last_log = time.monotonic()
+        self.osc_server = self.osc_engine.serve('127.0.0.1', 57121, disp)
         # IP address and port of the destination Python app
-        self.osc_client = udp_client.SimpleUDPClient("127.0.0.1", 50000)  #send to keyboard_listener.py
+        self.osc_client = self.osc_engine.sender("127.0.0.1", 50000)  #send to keyboard_listener.py
+        self.drain_keys()
 
 
     def setup_osc_client(self):
         # IP address and port of the destination Python app
-        self.osc_client = udp_client.SimpleUDPClient("127.0.0.1", 57122)  # Adjust IP and port as necessary
+        self.osc_client = OscEngine.shared().sender("127.0.0.1", 57122)  # Adjust IP and port as necessary
 
     def key_on_handler(self, unused_addr, *args):
-        print(f"Key On Message Received: {args}")
-        midi_number = args[1] if args else None
-        if midi_number is not None:
-            print(f"Processing Key On for MIDI: {midi_number}")
-            self.root.after(0, self.activate_key, midi_number)
-            # Forward the message to the destination app
-            self.osc_client.send_message("/keyOn", midi_number)
+        self.ingest(True, "/keyOn", args)
 
     def key_off_handler(self, unused_addr, *args):
-        print(f"Key Off Message Received: {args}")
-        midi_number = args[1] if args else None
-        if midi_number is not None:
-            print(f"Processing Key Off for MIDI: {midi_number}")
-            self.root.after(0, self.deactivate_key, midi_number)
-            # Forward the message to the destination app
-            self.osc_client.send_message("/keyOff", midi_number)
+        self.ingest(False, "/keyOff", args)
+
+    def ingest(self, on, address, args):
+        """Queue a received key for the Tk thread and for forwarding; runs on the OSC engine's thread."""
+        args, trace = split_trace(args, 2)
+        midi_number = args[1] if len(args) > 1 else None
+        if midi_number is None:
+            return
+        self.note_ring.push((on, midi_number))
+        if not self.forward_pending:
+            # Runs after the datagrams already received in this loop iteration
+            self.osc_engine.loop.call_soon(self.flush_forwards)
+        self.forward_pending.append((address, self.forward_args(midi_number, trace)))
+
+    def forward_args(self, midi_number, trace):
+        if trace is None:
+            return [midi_number]
+        self.tracer.receive('music21->piano', trace)
+        return [midi_number] + self.tracer.forward(trace)
+
+    def flush_forwards(self):
+        """Forward the pending key messages to the destination app, several to a datagram."""
+        messages, self.forward_pending = self.forward_pending, []
+        if len(messages) == 1:
+            self.osc_client.send_message(*messages[0])
+            return
+        for start in range(0, len(messages), FORWARD_BUNDLE_SIZE):
+            self.osc_client.send(build_bundle(messages[start:start + FORWARD_BUNDLE_SIZE], osc_bundle_builder.IMMEDIATELY))
+
+    def drain_keys(self):
+        """Apply the keys received since the last frame; reschedules itself every frame.
+
+        The key colour manager repaints the changed keys on its own frame timer.
+        """
+        events = self.note_ring.drain()
+        for on, midi_number in events:
+            if on:
+                self.activate_key(midi_number)
+            else:
+                self.deactivate_key(midi_number)
+        if events:
+            self.log_keys(events)
+        self.root.after(self.key_color_manager.frame_interval, self.drain_keys)
+
+    def log_keys(self, events):
+        """Print one summary line per log_interval instead of a line per message."""
+        self.logged_events += len(events)
+        now = time.monotonic()
+        if now - self.last_log >= self.log_interval:
+            on, midi_number = events[-1]
+            print(f"Keys: {self.logged_events} received in {now - self.last_log:.1f}s, "
+                  f"last {'on' if on else 'off'} {midi_number}, {self.note_ring.dropped} dropped")
+            self.logged_events = 0
+            self.last_log = now
 
     def update_keys(self, white_keys, black_keys):
         self.white_keys = white_keys
@@ -221,8 +277,8 @@ class PianoApp:
             self.current_key = 'C'
 
         scale_type = self.current_scale.get()
-        scale_notes = MusicTheory.get_scale_notes(self.current_key, scale_type)
-        midi_notes = self.convert_scale_notes_to_midi(scale_notes, self.current_key)
+        midi_notes = MusicTheory.get_scale_midi_numbers(
+            self.current_key, scale_type, self.starting_midi_note, self.keyboard_size)
 
         # This line might be redundant if the highlighted keys are already updated in on_key_selected
         # self.key_color_manager.highlighted_keys = set(midi_notes)
@@ -230,27 +286,6 @@ class PianoApp:
         self.KeyColorManager_keys_for_notes(midi_notes)
 
 
-    def convert_scale_notes_to_midi(self, scale_notes, key):
-        all_midi_numbers = []
-        # Calculate the start MIDI for the key
-        start_midi = self.calculate_start_midi_for_key(key, self.starting_midi_note)
-        end_midi = self.starting_midi_note + self.keyboard_size - 1
-
-        for midi_num in range(start_midi, end_midi + 1):
-            if midi_num % 12 in scale_notes:
-                all_midi_numbers.append(midi_num)
-
-        print(f"Debug: Correctly generated MIDI numbers for {key} scale: {all_midi_numbers}")
-        return all_midi_numbers
-
-    def calculate_start_midi_for_key(self, key, starting_midi_note):
-        # Find the first note of the scale that matches or exceeds the starting MIDI note
-        key_offset = MusicTheory.key_signature_map.get(key, 0)
-        # Calculate the lowest possible MIDI number for this key that is within the keyboard's range
-        lowest_possible_note = (starting_midi_note - key_offset) % 12 + key_offset
-        start_midi = starting_midi_note if starting_midi_note >= lowest_possible_note else lowest_possible_note + 12
-        return start_midi
-
 # Create the main window
 root = tk.Tk()
 root.title("88-Key Piano with OSC")
@@ -258,5 +293,10 @@ root.title("88-Key Piano with OSC")
 # Create the piano app
 app = PianoApp(root)
 
+# Startup time: music21 is imported only once a scale that is not built in or persisted is picked
+root.after_idle(lambda: print(
+    f"Visualizer ready in {time.perf_counter() - STARTED:.2f}s "
+    f"(music21 {'imported' if 'music21' in sys.modules else 'not imported'})"))
+
 # Run the application
 root.mainloop()
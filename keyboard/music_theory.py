@@ -1,4 +1,22 @@
-from music21 import scale, pitch
+import importlib.metadata
+import json
+import os
+
+# Intervals above the tonic of the common scales, so that they need no music21 import.
+# Other scales (OctatonicScale, SieveScale, RagMarwa, ...) are built by music21 once and persisted.
+BUILTIN_SCALE_STEPS = {
+    "MajorScale": (0, 2, 4, 5, 7, 9, 11),
+    "MinorScale": (0, 2, 3, 5, 7, 8, 10),
+    "DorianScale": (0, 2, 3, 5, 7, 9, 10),
+    "PhrygianScale": (0, 1, 3, 5, 7, 8, 10),
+    "LydianScale": (0, 2, 4, 6, 7, 9, 11),
+    "MixolydianScale": (0, 2, 4, 5, 7, 9, 10),
+    "HarmonicMinorScale": (0, 2, 3, 5, 7, 8, 11),
+    "MelodicMinorScale": (0, 2, 3, 5, 7, 9, 11),
+    "WholeToneScale": (0, 2, 4, 6, 8, 10),
+    "ChromaticScale": tuple(range(12)),
+}
+
 
 class MusicTheory:
     key_signature_map = {
@@ -7,30 +25,109 @@ class MusicTheory:
         "C#": 1,  # Adding C#
     }
 
+    # (key, scale type) -> 12-bit pitch-class mask (bit 0 is C) of scales music21 built,
+    # read from scale_masks_path on first use
+    scale_masks = None
+    scale_masks_path = None  # Set on first use; named after the music21 version
+    # (key, scale type, starting MIDI note, keyboard size) -> the scale's MIDI numbers on that keyboard
+    scale_midi_numbers = {}
+
+    @classmethod
+    def get_scale_mask(cls, key_name, scale_type):
+        """Pitch-class bitmask of a scale.
+
+        Common scales come from BUILTIN_SCALE_STEPS. music21 builds any other
+        scale once, ever; after that it is a lookup.
+        """
+        steps = BUILTIN_SCALE_STEPS.get(scale_type)
+        if steps is not None and key_name in cls.key_signature_map:
+            tonic = cls.key_signature_map[key_name]
+            return sum(1 << (tonic + step) % 12 for step in steps)
+        masks = cls.load_scale_masks()
+        mask = masks.get((key_name, scale_type))
+        if mask is None:
+            mask = masks[(key_name, scale_type)] = cls.compute_scale_mask(key_name, scale_type)
+            cls.save_scale_masks()
+        return mask
+
+    @staticmethod
+    def compute_scale_mask(key_name, scale_type):
+        from music21 import scale  # Imported only when a scale is not built in or persisted
+        scale_class = getattr(scale, scale_type, None)
+        if not scale_class:
+            raise ValueError(f"Scale type '{scale_type}' is not recognized.")
+        mask = 0
+        for p in scale_class(key_name).getPitches():
+            mask |= 1 << p.pitchClass
+        return mask
+
+    @classmethod
+    def load_scale_masks(cls):
+        if cls.scale_masks is None:
+            try:
+                version = importlib.metadata.version('music21')
+            except importlib.metadata.PackageNotFoundError:
+                version = 'unknown'
+            cls.scale_masks_path = os.path.join(
+                os.path.expanduser('~'), '.cache', 'computational-music', f'scale-masks-{version}.json')
+            cls.scale_masks = {}
+            try:
+                with open(cls.scale_masks_path) as f:
+                    cls.scale_masks = {tuple(k.split('|')): mask for k, mask in json.load(f).items()}
+            except FileNotFoundError:
+                pass
+            except (OSError, ValueError) as e:
+                print(f"Discarding unreadable scale table {cls.scale_masks_path}: {e}")
+        return cls.scale_masks
+
+    @classmethod
+    def save_scale_masks(cls):
+        try:
+            os.makedirs(os.path.dirname(cls.scale_masks_path), exist_ok=True)
+            tmp_path = f"{cls.scale_masks_path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump({f"{k}|{t}": mask for (k, t), mask in cls.scale_masks.items()}, f)
+            os.replace(tmp_path, cls.scale_masks_path)
+        except OSError as e:
+            print(f"Could not save scale table {cls.scale_masks_path}: {e}")
+
+    @classmethod
+    def get_scale_midi_numbers(cls, key_name, scale_type, starting_midi_note, keyboard_size):
+        """The MIDI numbers of a scale's keys on a keyboard (61, 76 or 88 keys from starting_midi_note), memoized."""
+        entry = (key_name, scale_type, starting_midi_note, keyboard_size)
+        midi_numbers = cls.scale_midi_numbers.get(entry)
+        if midi_numbers is None:
+            mask = cls.get_scale_mask(key_name, scale_type)
+            start_midi = cls.calculate_start_midi_for_key(key_name, starting_midi_note)
+            end_midi = starting_midi_note + keyboard_size - 1
+            midi_numbers = cls.scale_midi_numbers[entry] = tuple(
+                m for m in range(start_midi, end_midi + 1) if mask >> (m % 12) & 1)
+        return midi_numbers
+
+    @classmethod
+    def calculate_start_midi_for_key(cls, key, starting_midi_note):
+        # Find the first note of the scale that matches or exceeds the starting MIDI note
+        key_offset = cls.key_signature_map.get(key, 0)
+        # Calculate the lowest possible MIDI number for this key that is within the keyboard's range
+        lowest_possible_note = (starting_midi_note - key_offset) % 12 + key_offset
+        return starting_midi_note if starting_midi_note >= lowest_possible_note else lowest_possible_note + 12
+
     @staticmethod
     def get_notes_for_key(key_name):
         # Debugging output
         print(f"get_notes_for_key: Processing key {key_name}")
+        from music21 import scale
         major_scale = scale.MajorScale(key_name)
         notes = [n.pitchClass for n in major_scale.pitches]
         unique_notes = sorted(set(notes))
         print(f"get_notes_for_key: Key {key_name}, Pitch Classes: {unique_notes}")
         return unique_notes
 
-    @staticmethod
-    def get_scale_notes(key_name, scale_type):
-        # Debugging output
-        print(f"get_scale_notes: Processing scale {scale_type} for key {key_name}")
-        scale_class = getattr(scale, scale_type, None)
-        if not scale_class:
-            print(f"get_scale_notes: Scale type '{scale_type}' is not recognized.")
-            raise ValueError(f"Scale type '{scale_type}' is not recognized.")
-        selected_scale = scale_class(key_name)
-        notes = [n.pitchClass for n in selected_scale.getPitches()]
-        note_names = [n.name for n in selected_scale.getPitches()]
-        unique_notes = sorted(set(notes))
-        print(f"get_scale_notes: Scale {scale_type} for Key: {key_name}, Pitch Classes: {unique_notes}, Note Names: {note_names}")
-        return unique_notes
+    @classmethod
+    def get_scale_notes(cls, key_name, scale_type):
+        """Sorted pitch classes of a scale."""
+        mask = cls.get_scale_mask(key_name, scale_type)
+        return [pc for pc in range(12) if mask >> pc & 1]
 
     @staticmethod
     def convert_notes_to_midi(key_name, note_names):
@@ -38,6 +135,7 @@ class MusicTheory:
         # Debugging output
         print(f"Converting note names to MIDI: {note_names} in key {key_name}")
 
+        from music21 import pitch
         midi_numbers = []
         for name in note_names:
             p = pitch.Pitch(name)
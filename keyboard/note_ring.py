@@ -0,0 +1,35 @@
+class NoteRing:
+    """Bounded ring buffer of note events from one producer thread to one consumer thread.
+
+    Only the producer advances tail and only the consumer advances head.
+    Each is a single attribute store, atomic under the GIL, so neither side
+    takes a lock. When the ring is full, push() drops the event and counts
+    it in dropped rather than blocking the producer.
+    """
+
+    def __init__(self, capacity=4096):
+        self.capacity = capacity
+        self.slots = [None] * capacity
+        self.head = 0  # Next slot to read; only drain() changes it
+        self.tail = 0  # Next slot to write; only push() changes it
+        self.dropped = 0
+
+    def __len__(self):
+        return self.tail - self.head
+
+    def push(self, event):
+        tail = self.tail
+        if tail - self.head >= self.capacity:
+            self.dropped += 1
+            return False
+        self.slots[tail % self.capacity] = event
+        self.tail = tail + 1  # Publishes the slot written above
+        return True
+
+    def drain(self, limit=None):
+        """Remove and return up to limit events (all by default), oldest first."""
+        head = self.head
+        end = self.tail if limit is None else min(self.tail, head + limit)
+        events = [self.slots[i % self.capacity] for i in range(head, end)]
+        self.head = end
+        return events
@@ -0,0 +1,120 @@
+"""Headless batch analysis of a corpus of scores.
+
+Runs the same analysis as Music21Module.analyze_score over every score matched by
+the given directories or glob patterns, using a process pool, and streams one JSON
+record per score:
+
+    python batch_analyze.py "data/**/*.mxl" --workers 8 --timeout 120 > analysis.jsonl
+
+The exit status is 1 if no scores are found or any score fails or times out.
+"""
+import argparse
+import concurrent.futures
+import glob
+import json
+import os
+import signal
+import sys
+import time
+from music21 import converter
+from score_analysis import summarize_score
+from score_cache import ScoreCache
+
+SCORE_EXTENSIONS = ('.mxl', '.musicxml', '.xml', '.mid', '.midi', '.mscx', '.krn', '.abc')
+
+
+class AnalysisTimeout(Exception):
+    pass
+
+
+def find_scores(patterns):
+    """Expand directories (recursively) and glob patterns into a sorted list of score files."""
+    paths = set()
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            for dirpath, _, filenames in os.walk(pattern):
+                for name in filenames:
+                    if name.lower().endswith(SCORE_EXTENSIONS):
+                        paths.add(os.path.join(dirpath, name))
+        else:
+            paths.update(p for p in glob.glob(pattern, recursive=True) if os.path.isfile(p))
+    return sorted(paths)
+
+
+def _raise_timeout(signum, frame):
+    raise AnalysisTimeout()
+
+
+def analyze_file(file_path, timeout=None, use_cache=False):
+    """Parse and analyze one score; never raises, errors are reported in the record."""
+    record = {'path': file_path}
+    start = time.perf_counter()
+    # SIGALRM interrupts the worker itself, so a runaway parse does not tie up its slot
+    use_alarm = timeout and hasattr(signal, 'SIGALRM')
+    if use_alarm:
+        signal.signal(signal.SIGALRM, _raise_timeout)
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        if use_cache:
+            score = ScoreCache().load(file_path)
+        else:
+            score = converter.parse(file_path).makeNotation()
+        record.update(summarize_score(score))
+        record['status'] = 'ok'
+    except AnalysisTimeout:
+        record['status'] = 'timeout'
+        record['error'] = f"Analysis exceeded {timeout} seconds"
+    except Exception as e:
+        record['status'] = 'error'
+        record['error'] = f"{type(e).__name__}: {e}"
+    finally:
+        if use_alarm:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+    record['seconds'] = round(time.perf_counter() - start, 3)
+    return record
+
+
+def run_batch(paths, workers=None, timeout=None, use_cache=False):
+    """Yield one analysis record per path, in completion order."""
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(analyze_file, path, timeout, use_cache): path for path in paths}
+        for future in concurrent.futures.as_completed(futures):
+            try:
+                yield future.result()
+            except Exception as e:
+                # The worker process itself died (e.g. killed or out of memory)
+                yield {'path': futures[future], 'status': 'error',
+                       'error': f"{type(e).__name__}: {e}"}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Analyze a corpus of scores and emit JSON lines.")
+    parser.add_argument('paths', nargs='+', help="Score files, directories or glob patterns")
+    parser.add_argument('--workers', type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument('--timeout', type=float, default=300, help="Per-file time limit in seconds")
+    parser.add_argument('--cache', action='store_true', help="Read and fill the parsed-score cache")
+    parser.add_argument('--output', default='-', help="Output file (default: stdout)")
+    args = parser.parse_args(argv)
+
+    paths = find_scores(args.paths)
+    if not paths:
+        print("No scores found.", file=sys.stderr)
+        return 1
+
+    out = sys.stdout if args.output == '-' else open(args.output, 'w')
+    failures = 0
+    try:
+        for record in run_batch(paths, args.workers, args.timeout, args.cache):
+            if record['status'] != 'ok':
+                failures += 1
+            out.write(json.dumps(record) + '\n')
+            out.flush()
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    print(f"Analyzed {len(paths)} scores, {failures} failed.", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
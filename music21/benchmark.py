@@ -0,0 +1,157 @@
+"""Headless benchmarks of the score pipeline over the bundled scores.
+
+Times (and, with tracemalloc, measures the peak memory of) each stage of
+Music21Module on every bundled score and writes the results as JSON. Passing
+the JSON of an earlier run with --compare reports the stages that got slower:
+
+    python benchmark.py --output before.json
+    python benchmark.py --compare before.json --threshold 0.2
+"""
+import argparse
+import contextlib
+import glob
+import importlib.util
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+import numpy
+import music21
+from music21 import converter
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_SCORES = (
+    sorted(glob.glob(os.path.join(HERE, 'data', '*.mxl')))
+    + [os.path.join(HERE, 'example', 'Clair_de_Lune__Debussy.mxl'),
+       os.path.join(HERE, 'data', 'saved_scores', 'messiaen-chords.mxl')]
+)
+
+
+def load_module_class():
+    """Import Music21Module from music-loader.py, whose file name is not a valid module name."""
+    spec = importlib.util.spec_from_file_location('music_loader', os.path.join(HERE, 'music-loader.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module.Music21Module
+
+
+def measure(fn, repeat, trace_memory):
+    """Run fn repeat times; return (its last result, timing and memory record)."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            result = fn()
+        timings.append(time.perf_counter() - start)
+    record = {
+        'seconds': statistics.median(timings),
+        'min_seconds': min(timings),
+        'runs': repeat,
+    }
+    if trace_memory:
+        # A separate run, as tracing slows allocation-heavy code several times over
+        tracemalloc.start()
+        with contextlib.redirect_stdout(io.StringIO()):
+            fn()
+        record['peak_bytes'] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return result, record
+
+
+def benchmark_score(module_class, file_path, repeat, trace_memory, output_dir):
+    """Benchmark every stage on one score, feeding each stage the result of the one before."""
+    app = module_class(None)
+    records = []
+
+    def run(name, fn):
+        result, record = measure(fn, repeat, trace_memory)
+        record.update(file=os.path.basename(file_path), benchmark=name)
+        records.append(record)
+        return result
+
+    # 'parse' always reads the file itself; 'parse_cached' may load music21's own pickle of it instead
+    parsed = run('parse', lambda: converter.parse(file_path, forceSource=True))
+    run('parse_cached', lambda: converter.parse(file_path))
+    app.score = run('makeNotation', lambda: parsed.makeNotation())
+    run('analyze_score', lambda: app.analyze_score(app.score))
+
+    def get_all_chords():
+        app.event_table = None  # Include the event table extraction in every run
+        return app.get_all_chords(app.score)
+    chords = run('get_all_chords', get_all_chords)
+
+    staved = [name for name, parts in app.instrument_stave_map.items() if len(parts) > 1]
+    if staved:
+        run('combine_staves_for_instrument', lambda: [app.combine_staves_for_instrument(name) for name in staved])
+
+    run('filter_duplicate_chords', lambda: app.filter_duplicate_chords(chords))
+    run('calculate_morph_values',
+        lambda: [app.calculate_morph_values(a, b) for a, b in zip(chords, chords[1:])])
+    target = os.path.join(output_dir, 'chords.xml')
+    run('save_chords_to_musicxml', lambda: app.save_chords_to_musicxml(chords, target))
+    return records
+
+
+def compare(results, previous, threshold):
+    """Return (file, benchmark, old seconds, new seconds) for every stage more than threshold slower."""
+    before = {(r['file'], r['benchmark']): r['seconds'] for r in previous['results']}
+    regressions = []
+    for r in results:
+        old = before.get((r['file'], r['benchmark']))
+        if old and r['seconds'] > old * (1 + threshold):
+            regressions.append((r['file'], r['benchmark'], old, r['seconds']))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the score pipeline on the bundled scores.")
+    parser.add_argument('scores', nargs='*', help="Score files (default: the bundled scores)")
+    parser.add_argument('--repeat', type=int, default=3, help="Timed runs per stage; the median is reported")
+    parser.add_argument('--no-memory', action='store_true', help="Skip the tracemalloc peak-memory runs")
+    parser.add_argument('--output', default='-', help="Output file (default: stdout)")
+    parser.add_argument('--compare', help="JSON results of an earlier run to check for regressions")
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help="Relative slowdown reported as a regression (default: 0.2)")
+    args = parser.parse_args(argv)
+
+    module_class = load_module_class()
+    results = []
+    with tempfile.TemporaryDirectory() as output_dir:
+        for file_path in args.scores or DEFAULT_SCORES:
+            print(f"Benchmarking {os.path.basename(file_path)}...", file=sys.stderr)
+            results.extend(benchmark_score(module_class, file_path, args.repeat, not args.no_memory, output_dir))
+
+    report = {
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'music21': music21.VERSION_STR,
+            'numpy': numpy.__version__,
+        },
+        'results': results,
+    }
+    out = sys.stdout if args.output == '-' else open(args.output, 'w')
+    try:
+        json.dump(report, out, indent=2)
+        out.write('\n')
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        for file_name, name, old, new in regressions:
+            print(f"Regression: {file_name} {name}: {old:.4f}s -> {new:.4f}s", file=sys.stderr)
+        print(f"{len(regressions)} regressions.", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
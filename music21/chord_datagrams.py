@@ -0,0 +1,85 @@
+import struct
+import time
+from pythonosc.parsing import osc_types
+
+
+def _pad(data):
+    """NUL-terminate and pad to a multiple of 4 bytes, as OSC strings are."""
+    return data + b'\0' * (4 - len(data) % 4)
+
+
+def encode_message(address, ints):
+    """Encode an OSC message whose arguments are all int32."""
+    return _pad(address.encode()) + _pad(b',' + b'i' * len(ints)) + struct.pack(f'>{len(ints)}i', *ints)
+
+
+def encode_bundle_contents(datagrams):
+    """Encode the elements of an OSC bundle from already-encoded messages; stamp_bundle() completes it."""
+    return b''.join(struct.pack('>i', len(d)) + d for d in datagrams)
+
+
+def stamp_bundle(contents, timestamp):
+    """An OSC bundle of encoded contents, timetagged with timestamp (system time) as BundleOutput does."""
+    return b'#bundle\0' + osc_types.write_date(timestamp) + contents
+
+
+class ChordDatagrams:
+    """Pre-encoded OSC datagrams for scrubbing through a list of chords.
+
+    Every chord's /keyOnPlay, /keyOffPlay and /chordOn datagrams are encoded
+    when the list is built. /morphNotes depends on the previous chord, so it
+    is encoded for the neighbours of the current chord by prefetch(), and for
+    any other pair on first use. send() hands the bytes to an OscOutput, so
+    a keypress costs no encoding and no socket call on the caller's thread.
+
+    Key bundles are encoded without their timetag. send_bundle() stamps it
+    at send time, latency seconds ahead, as BundleOutput.send_bundle() does.
+    """
+
+    def __init__(self, chords, output, morph_values, channel=0, latency=0.05):
+        """morph_values(previous, index) returns the /morphNotes values between two chord indices, or [] if there are none."""
+        self.chords = chords
+        self.morph_values = morph_values
+        self.output = output
+        self.latency = latency
+        self.key_on = []
+        self.key_off = []
+        self.key_on_bundle = []
+        self.key_off_bundle = []
+        self.chord_on = []
+        for c in chords:
+            midi_numbers = [n.pitch.midi for n in c]
+            on = [encode_message("/keyOnPlay", [channel, m]) for m in midi_numbers]
+            off = [encode_message("/keyOffPlay", [channel, m]) for m in midi_numbers]
+            self.key_on.append(on)
+            self.key_off.append(off)
+            self.key_on_bundle.append(encode_bundle_contents(on))
+            self.key_off_bundle.append(encode_bundle_contents(off))
+            self.chord_on.append(encode_message("/chordOn", midi_numbers))
+        self.morph = {}  # (previous index, index) -> datagram, or None if there is no morph
+
+    def morph_datagram(self, previous, index):
+        key = (previous, index)
+        if key not in self.morph:
+            values = self.morph_values(previous, index)
+            self.morph[key] = encode_message("/morphNotes", values) if values else None
+        return self.morph[key]
+
+    def prefetch(self, index, radius=2):
+        """Encode the morphs from each side into the chords within radius of index."""
+        for i in range(max(index - radius, 0), min(index + radius + 1, len(self.chords))):
+            for previous in (i - 1, i + 1):
+                if 0 <= previous < len(self.chords):
+                    self.morph_datagram(previous, i)
+
+    def send(self, datagram, key=None):
+        """Queue datagram on the output; key lets a newer datagram replace it while it waits."""
+        self.output.send_datagram(datagram, key)
+
+    def send_bundle(self, contents):
+        """Send bundle contents from key_on_bundle or key_off_bundle, timetagged latency seconds from now."""
+        self.output.send_datagram(stamp_bundle(contents, time.time() + self.latency))
+
+    def send_all(self, datagrams):
+        for datagram in datagrams:
+            self.output.send_datagram(datagram)
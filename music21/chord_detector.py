@@ -0,0 +1,95 @@
+import threading
+import numpy as np
+
+
+class ChordDetector:
+    """Groups timestamped note onsets into chords, in constant memory.
+
+    Notes are recorded in a ring of capacity (time, note) slots. A note
+    joins the open chord if it starts within window seconds of the chord's
+    previous note (or of its first note, with sliding=False), that is at or
+    before the chord's deadline(). Otherwise it
+    closes that chord and opens the next one. Boundaries follow the event
+    times given to add(), so there are no timers. flush(now) closes a chord
+    once no further note can join it.
+
+    Closed chords are kept in a history of the last history chords, as rows
+    of up to max_chord_size notes; notes beyond that are dropped from the
+    row. add() and flush() may run on one thread while chords(), latest()
+    and len() read from others.
+    """
+
+    def __init__(self, window=1.0, sliding=True, capacity=1024, history=256, max_chord_size=16):
+        self.window = window
+        self.sliding = sliding
+        self.capacity = capacity
+        self.times = np.zeros(capacity, dtype='f8')
+        self.notes = np.zeros(capacity, dtype='i2')
+        self.count = 0  # Notes ever recorded; the next one goes to slot count % capacity
+        self.chord_start = 0  # Count at the first note of the open chord
+        self.history = history
+        self.max_chord_size = max_chord_size
+        self.chord_notes = np.full((history, max_chord_size), -1, dtype='i2')  # Padded with -1
+        self.chord_times = np.zeros((history, 2), dtype='f8')  # First and last onset of each chord
+        self.chord_count = 0  # Chords ever closed; the next one goes to row chord_count % history
+        self.lock = threading.Lock()
+
+    def pending(self):
+        """Number of notes in the open chord."""
+        return self.count - self.chord_start
+
+    def deadline(self):
+        """Time after which no note can join the open chord, or None if there is none."""
+        if not self.pending():
+            return None
+        anchor = self.count - 1 if self.sliding else self.chord_start
+        return float(self.times[anchor % self.capacity]) + self.window
+
+    def add(self, note, time):
+        """Record a note onset; return the chord it closed (a list of notes), or None."""
+        with self.lock:
+            deadline = self.deadline()
+            closed = self._close() if deadline is not None and time > deadline else None
+            slot = self.count % self.capacity
+            self.times[slot] = time
+            self.notes[slot] = note
+            self.count += 1
+            if self.count - self.chord_start > self.capacity:
+                self.chord_start = self.count - self.capacity  # The oldest notes were overwritten
+            return closed
+
+    def flush(self, now):
+        """Close the open chord if now is past its deadline, so no later note could join it; return it, or None."""
+        with self.lock:
+            deadline = self.deadline()
+            if deadline is None or now <= deadline:
+                return None
+            return self._close()
+
+    def _close(self):
+        slots = np.arange(self.chord_start, self.count) % self.capacity
+        chord = self.notes[slots].tolist()
+        row = self.chord_count % self.history
+        size = min(len(chord), self.max_chord_size)
+        self.chord_notes[row] = -1
+        self.chord_notes[row, :size] = chord[:size]
+        self.chord_times[row] = self.times[slots[0]], self.times[slots[-1]]
+        self.chord_count += 1
+        self.chord_start = self.count
+        return chord
+
+    def __len__(self):
+        """Number of chords in the history."""
+        return min(self.chord_count, self.history)
+
+    def chords(self, n=None):
+        """The last n chords of the history (all by default) as lists of notes, oldest first."""
+        with self.lock:
+            n = len(self) if n is None else min(n, len(self))
+            rows = np.arange(self.chord_count - n, self.chord_count) % self.history
+            return [[note for note in row if note >= 0] for row in self.chord_notes[rows].tolist()]
+
+    def latest(self):
+        """The most recently closed chord, or None."""
+        chords = self.chords(1)
+        return chords[0] if chords else None
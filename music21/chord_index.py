@@ -0,0 +1,152 @@
+import numpy as np
+
+DEDUPE_MODES = ('exact', 'transposition', 'pitch-class-set', 'voicing')
+
+
+def _row_keys(matrix):
+    """View each row of a 2-D array as one opaque value, so rows can be compared and sorted as scalars."""
+    matrix = np.ascontiguousarray(matrix)
+    return matrix.view(np.dtype((np.void, matrix.dtype.itemsize * matrix.shape[1]))).ravel()
+
+
+class ChordIndex:
+    """Array-backed index of chords for deduplication and nearest-chord queries.
+
+    Every chord is stored as a row of a few precomputed matrices, so dedupe
+    and lookups are NumPy operations over the whole index rather than
+    Python loops:
+
+        exact          MIDI numbers as given, padded with -1
+        transposition  sorted MIDI numbers relative to the bass note
+        pitch class    12-bit mask of the pitch classes present
+        voicing        sorted MIDI numbers padded by repeating the top note
+
+    The voice-leading distance between two chords is the total number of
+    semitones moved when their sorted voices are paired bottom to top, the
+    smaller chord doubling its top voice.
+    """
+
+    def __init__(self, signatures, items=None):
+        """signatures is an (n, width) int matrix of MIDI numbers padded with -1, or a list of MIDI tuples."""
+        if not isinstance(signatures, np.ndarray):
+            signatures = self._pad(signatures)
+        self.signatures = signatures.astype('i2')
+        self.items = items if items is not None else list(range(len(signatures)))
+        self.sizes = (self.signatures >= 0).sum(axis=1)
+        # Sort each chord's pitches ascending, pushing the -1 padding to the end
+        filled = np.where(self.signatures >= 0, self.signatures, np.iinfo('i2').max)
+        ordered = np.sort(filled, axis=1)
+        self.bass = ordered[:, 0] if len(ordered) and ordered.shape[1] else np.zeros(len(ordered), dtype='i2')
+        top = ordered[np.arange(len(ordered)), np.maximum(self.sizes - 1, 0)] if ordered.shape[1] else self.bass
+        self.voicings = np.where(filled == np.iinfo('i2').max, -1, ordered).astype('i2')
+        self.padded_voicings = np.where(ordered == np.iinfo('i2').max, top[:, None], ordered).astype('i2')
+        self.intervals = np.where(self.voicings >= 0, self.voicings - self.bass[:, None], -1).astype('i2')
+        bits = np.where(self.signatures >= 0, 1 << (self.signatures % 12), 0)
+        self.pitch_class_masks = np.bitwise_or.reduce(bits, axis=1).astype('u2') if bits.shape[1] \
+            else np.zeros(len(bits), dtype='u2')
+
+    @staticmethod
+    def _pad(signatures):
+        width = max((len(s) for s in signatures), default=0)
+        matrix = np.full((len(signatures), width), -1, dtype='i2')
+        for row, signature in enumerate(signatures):
+            matrix[row, :len(signature)] = signature
+        return matrix
+
+    @classmethod
+    def from_chords(cls, chords):
+        """Index music21 Chords, keeping them as the index items."""
+        return cls([tuple(p.midi for p in c.pitches) for c in chords], list(chords))
+
+    @classmethod
+    def from_table(cls, table, element_ids):
+        """Index elements of an EventTable using its signature matrix; items are the source Chords."""
+        return cls(table.signature_matrix(element_ids), [table.elements[i] for i in element_ids])
+
+    def __len__(self):
+        return len(self.signatures)
+
+    def keys(self, mode):
+        """One comparable value per chord; chords with equal keys are duplicates under mode."""
+        if mode == 'exact':
+            return _row_keys(self.signatures)
+        if mode == 'transposition':
+            return _row_keys(self.intervals)
+        if mode == 'pitch-class-set':
+            return self.pitch_class_masks
+        if mode == 'voicing':
+            return _row_keys(self.padded_voicings)
+        raise ValueError(f"Unknown dedupe mode {mode!r}; expected one of {DEDUPE_MODES}")
+
+    def unique(self, mode='exact', tolerance=0):
+        """Indices of the first chord of each duplicate group under mode, in index order.
+
+        In 'voicing' mode a chord is a duplicate if it lies within tolerance
+        semitones of voice-leading distance of a chord already kept.
+        """
+        if not len(self):
+            return np.zeros(0, dtype='i8')
+        _, first = np.unique(self.keys(mode), return_index=True)
+        first = np.sort(first)
+        if mode == 'voicing' and tolerance > 0:
+            return first[self._unique_voicings(first, tolerance)]
+        return first
+
+    def _unique_voicings(self, rows, tolerance):
+        """Which of the distinct voicings at rows (in index order) to keep, as a boolean mask.
+
+        Two voicings within tolerance differ by at most tolerance in their
+        bass notes, their top notes and their sums. Kept voicings are
+        therefore bucketed by all three, in buckets tolerance + 1 wide, and
+        each voicing is only compared with those of the neighbouring buckets.
+        """
+        voicings = self.padded_voicings[rows].astype('i4')
+        if not voicings.shape[1]:
+            return np.arange(len(rows)) == 0
+        coarse = np.stack((voicings[:, 0], voicings[:, -1], voicings.sum(axis=1)), axis=1) // (tolerance + 1)
+        neighbours = [(a, b, c) for a in (-1, 0, 1) for b in (-1, 0, 1) for c in (-1, 0, 1)]
+        buckets = {}  # Coarse (bass, top, sum) -> positions of the kept voicings in it
+        keep = np.zeros(len(rows), dtype=bool)
+        for i, (bass, top, total) in enumerate(coarse.tolist()):
+            near = [j for a, b, c in neighbours for j in buckets.get((bass + a, top + b, total + c), ())]
+            if near and np.abs(voicings[near] - voicings[i]).sum(axis=1).min() <= tolerance:
+                continue
+            keep[i] = True
+            buckets.setdefault((bass, top, total), []).append(i)
+        return keep
+
+    def unique_items(self, mode='exact', tolerance=0):
+        return [self.items[i] for i in self.unique(mode, tolerance)]
+
+    def lookup(self, midi_numbers, mode='exact'):
+        """Indices of every indexed chord equal to midi_numbers under mode."""
+        query = ChordIndex([tuple(midi_numbers)])
+        if mode == 'pitch-class-set':
+            return np.flatnonzero(self.pitch_class_masks == query.pitch_class_masks[0])
+        width = self.signatures.shape[1]
+        if query.signatures.shape[1] > width:
+            return np.zeros(0, dtype='i8')
+        query = ChordIndex(np.pad(query.signatures, ((0, 0), (0, width - query.signatures.shape[1])),
+                                  constant_values=-1))
+        return np.flatnonzero(self.keys(mode) == query.keys(mode)[0])
+
+    def distances(self, midi_numbers):
+        """Voice-leading distance from midi_numbers to every indexed chord."""
+        if not len(self):
+            return np.zeros(0, dtype='i4')
+        query = np.sort(np.asarray(midi_numbers, dtype='i4'))
+        voicings = self.padded_voicings.astype('i4')
+        width = max(voicings.shape[1], len(query))
+        voicings = np.pad(voicings, ((0, 0), (0, width - voicings.shape[1])), mode='edge')
+        query = np.pad(query, (0, width - len(query)), mode='edge')
+        return np.abs(voicings - query).sum(axis=1)
+
+    def nearest(self, midi_numbers, k=5):
+        """Return (indices, distances) of the k chords closest to midi_numbers by voice leading, nearest first."""
+        distances = self.distances(midi_numbers)
+        k = min(k, len(distances))
+        if not k:
+            return np.zeros(0, dtype='i8'), distances[:0]
+        candidates = np.argpartition(distances, k - 1)[:k]
+        order = candidates[np.lexsort((candidates, distances[candidates]))]
+        return order, distances[order]
@@ -0,0 +1,236 @@
+import numpy as np
+
+# Tie flags, combined bitwise in the 'tie' column
+TIE_START = 1
+TIE_CONTINUE = 2
+TIE_STOP = 4
+TIE_FLAGS = {'start': TIE_START, 'continue': TIE_CONTINUE, 'stop': TIE_STOP}
+
+DEFAULT_VELOCITY = 64
+
+EVENT_DTYPE = np.dtype([
+    ('onset', 'f8'),       # Offset from the start of the score, in quarter lengths
+    ('duration', 'f8'),    # Quarter lengths
+    ('midi', 'i2'),
+    ('velocity', 'u1'),
+    ('part', 'i2'),        # Index into score.parts
+    ('staff', 'i2'),       # Index of the part among the parts of the same instrument
+    ('measure', 'i4'),     # Index of the measure within its part (-1 if the part has no measures)
+    ('tie', 'u1'),         # TIE_* flags
+    ('element', 'i4'),     # Index into EventTable.elements; shared by all notes of a chord
+    ('chord', '?'),        # True if the source element is a Chord
+])
+
+REST_DTYPE = np.dtype([
+    ('onset', 'f8'),
+    ('duration', 'f8'),
+    ('part', 'i2'),
+    ('measure', 'i4'),
+])
+
+
+class EventTable:
+    """Columnar, one-row-per-sounding-pitch view of a score.
+
+    The music21 tree is walked once in from_score(); chord extraction,
+    deduplication, pitch ranges and playback then work on NumPy columns.
+    Rows of the same element are contiguous and elements are numbered in
+    traversal order (part, measure, element), so ascending element indices
+    reproduce score order. The source Note/Chord objects are kept in
+    self.elements for callers that still need music21 objects.
+
+    Rests are kept in a separate self.rests array, and the barline offsets of
+    each part in self.part_measure_offsets; self.measure_offsets and
+    self.measure_numbers describe the measures of the longest part.
+    """
+
+    def __init__(self, events, elements, rests=None, part_measure_offsets=None,
+                 measure_numbers=None, highest_time=None, score=None):
+        self.events = events
+        self.elements = elements
+        self.rests = rests if rests is not None else np.zeros(0, dtype=REST_DTYPE)
+        self.part_measure_offsets = part_measure_offsets or []
+        self.measure_offsets = max(self.part_measure_offsets, key=len, default=np.zeros(0))
+        self.measure_numbers = measure_numbers if measure_numbers is not None else np.zeros(0, dtype='i4')
+        if highest_time is None:
+            highest_time = float((events['onset'] + events['duration']).max()) if len(events) else 0.0
+        self.highest_time = highest_time
+        self.score = score
+        self._element_index = None
+        self._measure_pitch_classes = None
+
+    @classmethod
+    def from_score(cls, score, instrument_stave_map=None):
+        """Extract every pitched note of score (or of any stream) into a new table."""
+        parts = list(score.parts) if score.hasPartLikeStreams() else [score]
+        staff_of_part = cls._staff_numbers(parts, instrument_stave_map)
+
+        rows = []
+        rest_rows = []
+        elements = []
+        part_measure_offsets = []
+        measure_numbers = []
+        for part_index, part in enumerate(parts):
+            staff = staff_of_part.get(id(part), 0)
+            measures = part.getElementsByClass('Measure')
+            part_measure_offsets.append(
+                np.array([float(part.offset + m.offset) for m in measures], dtype='f8'))
+            if len(measures) > len(measure_numbers):
+                measure_numbers = [m.number for m in measures]
+            for element, onset, measure_index in cls._iter_notes(part, measures):
+                if element.isRest:
+                    rest_rows.append((onset, float(element.quarterLength), part_index, measure_index))
+                    continue
+                element_index = len(elements)
+                elements.append(element)
+                is_chord = element.isChord
+                duration = float(element.quarterLength)
+                for n in (element.notes if is_chord else (element,)):
+                    if not hasattr(n, 'pitch'):
+                        continue  # Unpitched
+                    velocity = n.volume.velocity if n.hasVolumeInformation() else None
+                    rows.append((
+                        onset, duration, n.pitch.midi,
+                        DEFAULT_VELOCITY if velocity is None else velocity,
+                        part_index, staff, measure_index,
+                        TIE_FLAGS.get(n.tie.type, 0) if n.tie is not None else 0,
+                        element_index, is_chord,
+                    ))
+
+        return cls(np.array(rows, dtype=EVENT_DTYPE), elements,
+                   np.array(rest_rows, dtype=REST_DTYPE), part_measure_offsets,
+                   np.array(measure_numbers, dtype='i4'), float(score.highestTime), score)
+
+    @staticmethod
+    def _staff_numbers(parts, instrument_stave_map):
+        if instrument_stave_map is None:
+            instrument_stave_map = {}
+            for part in parts:
+                instrument_stave_map.setdefault(str(part.getInstrument()), []).append(part)
+        return {id(part): staff
+                for staves in instrument_stave_map.values()
+                for staff, part in enumerate(staves)}
+
+    @staticmethod
+    def _iter_notes(part, measures):
+        """Yield (element, absolute onset, measure index) for each note, chord and rest of a part."""
+        if not measures:
+            for element in part.flatten().notesAndRests:
+                yield element, part.offset + float(element.offset), -1
+            return
+        for measure_index, m in enumerate(measures):
+            measure_offset = part.offset + float(m.offset)
+            found = [(measure_offset + float(element.offset), element) for element in m.notesAndRests]
+            for v in m.voices:
+                voice_offset = measure_offset + float(v.offset)
+                found.extend((voice_offset + float(element.offset), element) for element in v.notesAndRests)
+            found.sort(key=lambda item: item[0])  # Interleave voices in time order
+            for onset, element in found:
+                yield element, onset, measure_index
+
+    def __len__(self):
+        return len(self.events)
+
+    @property
+    def part_count(self):
+        return len(self.part_measure_offsets)
+
+    def element_sizes(self):
+        """Number of pitched rows per element, indexed by element."""
+        return np.bincount(self.events['element'], minlength=len(self.elements))
+
+    def chord_element_ids(self, min_notes=1, part=None):
+        """Element indices of Chord elements with at least min_notes pitches, in score order."""
+        events = self.events
+        mask = events['chord']
+        if part is not None:
+            mask = mask & (events['part'] == part)
+        ids = np.unique(events['element'][mask])
+        if min_notes > 1:
+            ids = ids[self.element_sizes()[ids] >= min_notes]
+        return ids
+
+    def signature_matrix(self, element_ids):
+        """Return an (len(element_ids), max notes) int matrix of MIDI numbers, padded with -1."""
+        element_ids = np.asarray(element_ids, dtype='i4')
+        events = self.events
+        sizes = self.element_sizes()
+        starts = np.concatenate(([0], np.cumsum(sizes)[:-1]))
+        width = int(sizes[element_ids].max()) if len(element_ids) else 0
+        matrix = np.full((len(element_ids), width), -1, dtype='i2')
+        if not len(element_ids):
+            return matrix
+        row_counts = sizes[element_ids]
+        rows = np.repeat(np.arange(len(element_ids)), row_counts)
+        columns = np.arange(row_counts.sum()) - np.repeat(np.cumsum(row_counts) - row_counts, row_counts)
+        matrix[rows, columns] = events['midi'][np.repeat(starts[element_ids], row_counts) + columns]
+        return matrix
+
+    def unique_element_ids(self, element_ids):
+        """Drop elements whose MIDI signature repeats an earlier one, keeping score order."""
+        element_ids = np.asarray(element_ids, dtype='i4')
+        if not len(element_ids):
+            return element_ids
+        _, first = np.unique(self.signature_matrix(element_ids), axis=0, return_index=True)
+        return element_ids[np.sort(first)]
+
+    def chords(self, min_notes=1, unique=False, part=None):
+        """Return the source Chord objects, optionally deduplicated by MIDI signature."""
+        ids = self.chord_element_ids(min_notes, part)
+        if unique:
+            ids = self.unique_element_ids(ids)
+        return [self.elements[i] for i in ids]
+
+    def element_spans(self, element_ids):
+        """Return the (onsets, durations) of elements, in quarter lengths."""
+        element_ids = np.asarray(element_ids, dtype='i4')
+        first_rows = np.concatenate(([0], np.cumsum(self.element_sizes())[:-1]))[element_ids]
+        return self.events['onset'][first_rows], self.events['duration'][first_rows]
+
+    def element_ids_of(self, elements):
+        """Map music21 elements back to element indices; None if any is not in the table."""
+        if self._element_index is None:
+            self._element_index = {id(e): i for i, e in enumerate(self.elements)}
+        ids = [self._element_index.get(id(e)) for e in elements]
+        if any(i is None for i in ids):
+            return None
+        return np.array(ids, dtype='i4')
+
+    def pitch_range(self, part=None):
+        """Return (lowest, highest) MIDI number, or None if there are no pitched notes."""
+        midi = self.events['midi'] if part is None else self.events['midi'][self.events['part'] == part]
+        if not len(midi):
+            return None
+        return int(midi.min()), int(midi.max())
+
+    def measure_of(self, onsets):
+        """Index into measure_offsets of the measure containing each onset (0 if there are no measures)."""
+        if not len(self.measure_offsets):
+            return np.zeros(len(onsets), dtype='i4')
+        return np.maximum(np.searchsorted(self.measure_offsets, onsets, side='right') - 1, 0)
+
+    def measure_pitch_classes(self):
+        """Duration-weighted pitch-class histogram of each measure, as a (measures, 12) array.
+
+        Computed once per table; the window size of key analyses can change
+        without rescanning the notes.
+        """
+        if self._measure_pitch_classes is None:
+            events = self.events
+            histograms = np.zeros((max(len(self.measure_offsets), 1), 12))
+            np.add.at(histograms, (self.measure_of(events['onset']), events['midi'] % 12), events['duration'])
+            self._measure_pitch_classes = histograms
+        return self._measure_pitch_classes
+
+    def part_groups(self, part):
+        """Return (onsets, durations, midi lists) for each element of a part, sorted by onset."""
+        return element_groups(self.events[self.events['part'] == part])
+
+
+def element_groups(events):
+    """Return (onsets, durations, midi lists) for each element of some EVENT_DTYPE rows, sorted by onset."""
+    events = events[np.argsort(events['onset'], kind='stable')]
+    _, starts = np.unique(events['element'], return_index=True)
+    starts = np.sort(starts)
+    midi_groups = np.split(events['midi'], starts[1:]) if len(starts) else []
+    return events['onset'][starts], events['duration'][starts], midi_groups
@@ -0,0 +1,87 @@
+import numpy as np
+from music21 import analysis
+from score_analysis import spell_key
+
+MODES = ('major', 'minor')
+
+
+def key_profiles(key_analysis=analysis.discrete.AardenEssen):
+    """Return a (24, 12) matrix of key profiles: the 12 major keys by tonic, then the 12 minor keys."""
+    analyzer = key_analysis()
+    profiles = np.empty((24, 12))
+    for m, mode in enumerate(MODES):
+        weights = np.asarray(analyzer.getWeights(mode), dtype='f8')
+        for tonic in range(12):
+            profiles[m * 12 + tonic] = np.roll(weights, tonic)
+    return profiles
+
+
+def window_sums(histograms, window):
+    """Sum the rows of histograms over a window of measures centred on each measure.
+
+    Windows are clipped at the start and end of the piece, so every measure
+    gets one. Uses a cumulative sum, so the cost does not depend on window.
+    """
+    count = len(histograms)
+    window = max(1, min(window, count))
+    starts = np.clip(np.arange(count) - (window - 1) // 2, 0, count - window)
+    cumulative = np.vstack((np.zeros((1, 12)), np.cumsum(histograms, axis=0)))
+    return cumulative[starts + window] - cumulative[starts]
+
+
+def correlate_profiles(distributions, profiles):
+    """Pearson correlation of every distribution row with every profile row, as one matrix product."""
+    d = distributions - distributions.mean(axis=1, keepdims=True)
+    p = profiles - profiles.mean(axis=1, keepdims=True)
+    d_norm = np.sqrt((d * d).sum(axis=1, keepdims=True))
+    p_norm = np.sqrt((p * p).sum(axis=1))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        correlations = (d @ p.T) / (d_norm * p_norm)
+    return np.nan_to_num(correlations)  # Silent windows correlate with nothing
+
+
+class KeyTrack:
+    """Estimated key of each measure, from windows of neighbouring measures."""
+
+    def __init__(self, measure_numbers, correlations, key_analysis=analysis.discrete.AardenEssen):
+        self.measure_numbers = measure_numbers
+        self.correlations = correlations  # (measures, 24), columns as in key_profiles()
+        self.best = correlations.argmax(axis=1)
+        self.coefficients = correlations[np.arange(len(correlations)), self.best]
+        # Measures without notes (all-zero correlations) have no key
+        self.silent = ~correlations.any(axis=1)
+        self.key_analysis = key_analysis
+
+    def key_at(self, measure_index):
+        """The music21 Key of the measure at measure_index, or None if its window is silent."""
+        if self.silent[measure_index]:
+            return None
+        column = int(self.best[measure_index])
+        return spell_key(self.key_analysis(), column % 12, MODES[column // 12],
+                         float(self.coefficients[measure_index]))
+
+    def keys(self):
+        return [self.key_at(i) for i in range(len(self.best))]
+
+    def changes(self):
+        """Return (measure number, Key) for the first measure and every measure where the key changes."""
+        found = []
+        previous = None
+        for i in range(len(self.best)):
+            column = None if self.silent[i] else int(self.best[i])
+            if i == 0 or column != previous:
+                found.append((self.measure_numbers[i], self.key_at(i)))
+            previous = column
+        return found
+
+
+def analyze_key_track(table, window=4, key_analysis=analysis.discrete.AardenEssen):
+    """Estimate a per-measure key track for an EventTable.
+
+    The measure histograms are cached on the table, so calling this again
+    with another window size only redoes the window sums and the correlation.
+    """
+    histograms = table.measure_pitch_classes()
+    correlations = correlate_profiles(window_sums(histograms, window), key_profiles(key_analysis))
+    measure_numbers = table.measure_numbers.tolist() if len(table.measure_numbers) else [1]
+    return KeyTrack(measure_numbers, correlations, key_analysis)
@@ -1,50 +1,70 @@
-import threading
-from collections import deque
-import time
 from pythonosc.dispatcher import Dispatcher
-from pythonosc.osc_server import BlockingOSCUDPServer
+from chord_detector import ChordDetector
+from osc_engine import OscEngine
+from osc_trace import LatencyTracer, elapsed_us, now_us, split_trace
 
 class KeyboardListener:
-    def __init__(self, port=50000, chord_duration=1):
+    def __init__(self, port=50000, chord_duration=1, engine=None, trace_dump_interval=10, history=256,
+                 sliding=True):
+        # Handlers run on the shared OSC engine's loop
+        self.engine = engine or OscEngine.shared()
+        # Latencies of traced /keyOn messages, and of chords from their first note's origin
+        self.tracer = LatencyTracer('keyboard_listener', self.engine, trace_dump_interval)
+        self.chordOrigin = None
         self.port = port
         self.chord_duration = chord_duration
-        self.liveChords = deque()
-        self.currentChordNotes = []
+        # Notes within chord_duration of the previous one (of the first one, unless sliding) form a chord;
+        # the last history chords are kept
+        self.detector = ChordDetector(window=chord_duration, sliding=sliding, history=history)
+        self.chordCheck = None  # The one pending loop call that closes a chord once no note can join it
         self.dispatcher = Dispatcher()
         self.dispatcher.map("/keyOn", self.key_on_handler)
-        self.server = BlockingOSCUDPServer(('127.0.0.1', self.port), self.dispatcher)
+        self.tracer.serve(self.dispatcher)
+        self.endpoint = None
         self.listening = False
-        self.chordTimer = None
+
+    @property
+    def liveChords(self):
+        """The recent chords, oldest first; safe to read from any thread."""
+        return self.detector.chords()
 
     def key_on_handler(self, address, *args):
-        note = args[0]  # Assuming the first arg is the MIDI note number
-        print(f"Note received: {note}")
-        if not self.currentChordNotes:
-            # Start timer on receiving the first note of a chord
-            self.start_chord_timer()
-        self.currentChordNotes.append(note)
+        payload, trace = split_trace(args, 1)
+        note = payload[0]  # Assuming the first arg is the MIDI note number
+        if trace:
+            self.tracer.receive('piano->listener', trace)
+        now = self.engine.time()
+        chord = self.detector.add(note, now)
+        if chord is not None:
+            self.finalize_chord(chord)
+        if self.detector.pending() == 1:
+            self.chordOrigin = trace[1] if trace else None
+        if self.chordCheck is None:
+            self.chordCheck = self.engine.call_at(self.detector.deadline(), self.check_chord)
 
-    def start_chord_timer(self):
-        if self.chordTimer:
-            self.chordTimer.cancel()
-        self.chordTimer = threading.Timer(self.chord_duration, self.finalize_chord)
-        self.chordTimer.start()
+    def check_chord(self):
+        """Close the open chord if its window has passed, or look again at its new deadline."""
+        self.chordCheck = None
+        chord = self.detector.flush(self.engine.time())
+        if chord is not None:
+            self.finalize_chord(chord)
+        elif self.detector.pending():
+            self.chordCheck = self.engine.call_at(self.detector.deadline(), self.check_chord)
 
-    def finalize_chord(self):
-        chord = list(self.currentChordNotes)  # Copy current notes to form a chord
-        self.liveChords.append(chord)
-        print(f"New chord: {chord}, Live Chords Size: {len(self.liveChords)}")
-        self.currentChordNotes.clear()
+    def finalize_chord(self, chord):
+        print(f"New chord: {chord}, Live Chords Size: {len(self.detector)}")
+        if self.chordOrigin is not None:
+            # Includes the chord_duration collection window
+            self.tracer.record('chord_finalize', elapsed_us(self.chordOrigin, now_us()))
+            self.chordOrigin = None
 
     def start_listening(self):
         if not self.listening:
+            self.endpoint = self.engine.serve('127.0.0.1', self.port, self.dispatcher)
             self.listening = True
-            threading.Thread(target=self.run_server, daemon=True).start()
-
-    def run_server(self):
-        self.server.serve_forever()
 
     def stop_listening(self):
         if self.listening:
-            self.server.shutdown()
+            self.endpoint.close()
+            self.endpoint = None
             self.listening = False
@@ -0,0 +1,225 @@
+"""Offline rendering of what playback sends over OSC to a Standard MIDI File.
+
+The notes of a PlaybackRender are written on the channels play_score uses,
+at the notated tempi, with no real-time clock involved. Optionally the
+chords of the score are written too: each /chordOn becomes note-ons on a
+set of chord channels, one per voice. Each /morphNotes value becomes a
+pitch-bend glide of the outgoing chord's voice into the next chord.
+MorphTable values are already 14-bit MIDI pitch bends; the chord channels
+are set to their range of BEND_RANGE semitones. Channel 10, the General
+MIDI drum channel, is never used. Whole corpora can be rendered for
+regression comparison:
+
+    python midi_render.py data/*.mxl --output-dir renders
+"""
+import argparse
+import os
+import struct
+import sys
+import time
+import numpy as np
+from music21 import converter
+from event_table import DEFAULT_VELOCITY, EventTable
+from playback import MIDI_CHANNELS, NOTE_ON, PlaybackRender, TempoMap
+from voice_leading import BEND_CENTER, BEND_RANGE, MorphTable
+
+TICKS_PER_QUARTER = 480
+NOTE_OFF_STATUS = 0x80
+NOTE_ON_STATUS = 0x90
+CONTROL_CHANGE_STATUS = 0xB0
+PITCH_BEND_STATUS = 0xE0
+MAX_BEND = 0x3FFF
+DRUM_CHANNEL = 9
+MELODIC_CHANNELS = [c for c in range(MIDI_CHANNELS) if c != DRUM_CHANNEL]
+MORPH_QUARTERS = 0.25  # Length of the glide into the next chord
+MORPH_STEPS = 8  # Pitch-bend messages per glide
+END_OF_TRACK = b'\xff\x2f\x00'
+
+
+def encode_track(ticks, messages):
+    """Encode a track chunk from ascending absolute ticks and an (n, 3) uint8 matrix of channel messages."""
+    ticks = np.asarray(ticks, dtype='i8')
+    deltas = np.diff(ticks, prepend=0)
+    # Delta times are variable-length quantities: 7 bits per byte, high bit set on all but the last
+    lengths = 1 + (deltas >= 1 << 7) + (deltas >= 1 << 14) + (deltas >= 1 << 21)
+    starts = np.cumsum(lengths + 3) - (lengths + 3)
+    data = np.empty(int((lengths + 3).sum()), dtype='u1')
+    for k in range(4):
+        has = lengths > k
+        shift = 7 * (lengths[has] - 1 - k)
+        data[starts[has] + k] = ((deltas[has] >> shift) & 0x7F) | np.where(k < lengths[has] - 1, 0x80, 0)
+    for j in range(3):
+        data[starts + lengths + j] = messages[:, j]
+    body = data.tobytes() + b'\x00' + END_OF_TRACK
+    return b'MTrk' + struct.pack('>I', len(body)) + body
+
+
+def tempo_track(tempo_map):
+    """A track of set-tempo meta events at each tempo change."""
+    body = b''
+    previous = 0
+    for start, seconds_per_quarter in zip(tempo_map.starts, tempo_map.seconds_per_quarter):
+        tick = int(round(start * TICKS_PER_QUARTER))
+        body += _variable_length(tick - previous) + b'\xff\x51\x03' \
+            + struct.pack('>I', int(round(seconds_per_quarter * 1e6)))[1:]
+        previous = tick
+    body += b'\x00' + END_OF_TRACK
+    return b'MTrk' + struct.pack('>I', len(body)) + body
+
+
+def _variable_length(value):
+    groups = [value & 0x7F]
+    value >>= 7
+    while value:
+        groups.append(value & 0x7F | 0x80)
+        value >>= 7
+    return bytes(reversed(groups))
+
+
+def score_chords(table, element_ids=None):
+    """(onsets, durations, voicings) of chord elements of an EventTable (default: all), sorted by onset."""
+    if element_ids is None:
+        element_ids = table.chord_element_ids()
+    onsets, durations = table.element_spans(element_ids)
+    order = np.argsort(onsets, kind='stable')
+    voicings = [sorted(row[row >= 0].tolist()) for row in table.signature_matrix(element_ids)[order]]
+    return onsets[order], durations[order], voicings
+
+
+def part_channels(render):
+    """The MIDI channel of each channel of the render's timeline, skipping the drum channel.
+
+    The render's channels keep their order, so channels below the drum
+    channel are unchanged and the ones above it move up by one.
+    """
+    channels = np.unique(render.timeline['channel']).tolist()
+    if len(channels) > len(MELODIC_CHANNELS):
+        print(f"{len(channels)} part channels but only {len(MELODIC_CHANNELS)} melodic MIDI channels; "
+              f"the last {len(channels) - len(MELODIC_CHANNELS)} share channels with the first")
+    return {channel: MELODIC_CHANNELS[i % len(MELODIC_CHANNELS)] for i, channel in enumerate(channels)}
+
+
+def note_tracks(render, velocity=DEFAULT_VELOCITY, channels=None):
+    """One track per channel of the render's timeline, in channel order, on the MIDI channels of part_channels()."""
+    timeline = render.timeline
+    ticks = np.rint(render.tempo_map.offsets(timeline['time']) * TICKS_PER_QUARTER).astype('i8')
+    if channels is None:
+        channels = part_channels(render)
+    tracks = []
+    for channel in np.unique(timeline['channel']):
+        mask = timeline['channel'] == channel
+        messages = np.empty((int(mask.sum()), 3), dtype='u1')
+        on = timeline['kind'][mask] == NOTE_ON
+        messages[:, 0] = np.where(on, NOTE_ON_STATUS, NOTE_OFF_STATUS) | channels[int(channel)]
+        messages[:, 1] = timeline['midi'][mask]
+        messages[:, 2] = np.where(on, velocity, 64)
+        tracks.append(encode_track(ticks[mask], messages))
+    return tracks
+
+
+def bend_range_messages(channel, semitones=BEND_RANGE):
+    """Controller messages setting a channel's pitch-bend range (RPN 0,0) to semitones, then deselecting the RPN."""
+    status = CONTROL_CHANGE_STATUS | channel
+    return [(status, 101, 0), (status, 100, 0), (status, 6, semitones), (status, 38, 0),
+            (status, 101, 127), (status, 100, 127)]
+
+
+def outgoing_bends(previous, current, bends):
+    """The bend of each voice of chord previous in a morph to chord current, from its /morphNotes values.
+
+    The values have one column per note of the larger chord. If that is
+    the outgoing one, column i is its voice i. Otherwise each column is a
+    note of the incoming chord, led from an outgoing note no higher than
+    the one of the column before; each outgoing voice glides to the first
+    note led from it.
+    """
+    if len(previous) >= len(current):
+        return bends
+    sources = np.asarray(current) - np.rint((np.asarray(bends) - BEND_CENTER) * BEND_RANGE / BEND_CENTER)
+    return [bends[i] for i in np.searchsorted(sources, previous).tolist()]
+
+
+def chord_track(chords, channels, velocity=DEFAULT_VELOCITY):
+    """The chord sequence as played with Morph Chords, voice i (bottom to top) of every chord on channels[i].
+
+    Voices beyond len(channels) are left out. Each morph is a glide of the
+    outgoing chord's voices over the last MORPH_QUARTERS before the next
+    chord. The bends return to centre after the outgoing notes end and
+    before the next chord's notes start.
+    """
+    onsets, durations, voicings = chords
+    voices = len(channels)
+    truncated = sum(len(v) > voices for v in voicings)
+    if truncated:
+        print(f"{truncated} chords have more than {voices} voices, one per free MIDI channel; "
+              f"their upper voices are left out of the chord track")
+    voicings = [v[:voices] for v in voicings]
+    morphs = MorphTable(voicings)
+    rows = [(0, 0) + message for channel in channels for message in bend_range_messages(channel)]
+    # (tick, order, status, data1, data2); at one tick the glide comes first, then offs, bend resets and ons
+    for index, (onset, duration, voicing) in enumerate(zip(onsets, durations, voicings)):
+        start = int(round(onset * TICKS_PER_QUARTER))
+        end = int(round((onset + duration) * TICKS_PER_QUARTER))
+        bends = morphs.values(index - 1, index) if index else []
+        if bends:
+            glide_start = max(int(round(onsets[index - 1] * TICKS_PER_QUARTER)),
+                              start - int(round(MORPH_QUARTERS * TICKS_PER_QUARTER)))
+            ticks = np.linspace(glide_start, start, MORPH_STEPS + 1)[1:].round().astype(int).tolist()
+            for voice, bend in enumerate(outgoing_bends(voicings[index - 1], voicing, bends)):
+                status = PITCH_BEND_STATUS | channels[voice]
+                for tick, value in zip(ticks, np.linspace(BEND_CENTER, min(bend, MAX_BEND), MORPH_STEPS + 1)[1:]):
+                    value = int(round(value))
+                    rows.append((tick, 1, status, value & 0x7F, value >> 7))
+                rows.append((start, 3, status, BEND_CENTER & 0x7F, BEND_CENTER >> 7))
+        for voice, midi in enumerate(voicing):
+            channel = channels[voice]
+            rows.append((start, 4, NOTE_ON_STATUS | channel, midi, velocity))
+            rows.append((end, 2, NOTE_OFF_STATUS | channel, midi, 64))
+    rows = np.array(rows, dtype='i8').reshape(-1, 5)
+    rows = rows[np.lexsort((rows[:, 1], rows[:, 0]))]
+    return encode_track(rows[:, 0], rows[:, 2:].astype('u1'))
+
+
+def midi_bytes(render, chords=None, velocity=DEFAULT_VELOCITY):
+    """The Standard MIDI File (format 1) of a PlaybackRender, with an optional chord track from score_chords()."""
+    channels = part_channels(render)
+    tracks = [tempo_track(render.tempo_map)] + note_tracks(render, velocity, channels)
+    if chords is not None and len(chords[0]):
+        # Chord voices take the highest melodic channels the parts leave free, one each
+        used = set(channels.values())
+        free = [c for c in MELODIC_CHANNELS if c not in used]
+        voices = min(max(len(v) for v in chords[2]), len(free))
+        if voices:
+            tracks.append(chord_track(chords, free[len(free) - voices:], velocity))
+        else:
+            print("The parts use every melodic MIDI channel; the chord track is left out")
+    header = b'MThd' + struct.pack('>IHHH', 6, 1, len(tracks), TICKS_PER_QUARTER)
+    return header + b''.join(tracks)
+
+
+def render_midi(render, path, chords=None, velocity=DEFAULT_VELOCITY):
+    with open(path, 'wb') as f:
+        f.write(midi_bytes(render, chords, velocity))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Render scores to Standard MIDI Files as playback would send them.")
+    parser.add_argument('scores', nargs='+', help="Score files")
+    parser.add_argument('--output-dir', default='.', help="Directory for the .mid files (default: .)")
+    parser.add_argument('--no-chords', action='store_true', help="Leave out the chord and morph track")
+    args = parser.parse_args(argv)
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    for score_path in args.scores:
+        score = converter.parse(score_path)
+        start = time.perf_counter()
+        table = EventTable.from_score(score)
+        render = PlaybackRender.compile(table, TempoMap.from_score(score))
+        target = os.path.join(args.output_dir, os.path.splitext(os.path.basename(score_path))[0] + '.mid')
+        render_midi(render, target, None if args.no_chords else score_chords(table))
+        print(f"{target}: {time.perf_counter() - start:.3f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
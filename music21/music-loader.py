@@ -1,11 +1,27 @@
 # music21_module.py
 from music21 import *
 from keyboard_listener import KeyboardListener
-from pythonosc import udp_client
+from score_cache import ScoreCache
+from score_analysis import ScoreAnalyzer, extract_metadata
+from event_table import EventTable, element_groups
+from staff_merge import merge_staves
+from score_loader import ScoreLoadJob
+from streaming_reader import iter_measures
+from key_track import analyze_key_track
+from chord_index import ChordIndex, DEDUPE_MODES
+from chord_datagrams import ChordDatagrams
+from midi_render import render_midi, score_chords
+from voice_leading import MorphTable, morph_values
+from osc_bundles import BundleOutput
+from osc_engine import OscEngine, TkBridge
+from osc_output import OscOutput
+from osc_trace import LatencyTracer
+from playback import TempoMap, PlaybackRender, PlaybackScheduler, NOTE_ON
 from pythonosc.dispatcher import Dispatcher
 from pythonosc.osc_server import BlockingOSCUDPServer
 import tkinter as tk
 from tkinter import filedialog, Tk, Button
+import gc
 import time
 import threading
 
@@ -18,16 +34,45 @@ env['musicxmlPath'] = '/Applications/MuseScore 4.app/Contents/MacOS/mscore'
 
 class Music21Module:
     def __init__(self, master):
+        # With master=None the module runs headless (no widgets, no keyboard
+        # listener), for scripts such as benchmark.py
         self.master = master
+        # Sends, playback and the chord listener all run on the shared OSC engine's loop
+        self.osc_engine = OscEngine.shared()
+        # Every OSC message goes to all of these; add e.g. a recorder with self.client.add_destination()
+        self.osc_destinations = {'synth': ('127.0.0.1', 57120)}
         self.client = self.initialize_osc_client()
+        self.bundle_output = BundleOutput(self.client)
+        self.tracer = None  # LatencyTracer stamping key messages, while latency tracing is on
         self.score = None
+        self.event_table = None  # Columnar view of self.score, see get_event_table
         self.playing = False
         self.stop_playback_flag = False
+        self.scheduler = None  # PlaybackScheduler of the score being played
+        self.score_path = None  # File self.score was loaded from
+        self.render = None  # PlaybackRender of self.score, see get_playback_render
+        self.render_score = None
+        self.playback_rate = 1.0
         self.current_chord_index = 0
-        self.scrub_mode_var = tk.BooleanVar(self.master)  # Use self.master
+        self.chord_index = None  # ChordIndex of self.chords, built on the first similarity query
+        self.morph_table = None  # MorphTable of the steps between self.chords
+        self.chords_table = None  # EventTable the elements of self.chords belong to
+        self.chord_datagrams = None  # Pre-encoded scrub datagrams for self.chords
+        self.prev_chord_index = None
         self.prev_chord = None  # Initialize previous chord variable
         self.instrument_stave_map = {}  # Step 2: Initialize the mapping
         self.selected_instrument = None  # Initialize selected_instrument
+        self.score_cache = ScoreCache()
+        self.score_analyzer = ScoreAnalyzer()
+        self.analysis = None  # ScoreAnalysis of self.score
+        self.key_window = 4  # Measures per key-analysis window
+        self.key_track = None  # Per-measure KeyTrack of self.score
+        self.load_job = None
+        if self.master is None:
+            return
+
+        self.tk_bridge = TkBridge(self.master)  # Delivers engine-thread callbacks to Tk
+        self.scrub_mode_var = tk.BooleanVar(self.master)  # Use self.master
         self.keyboard_listener = KeyboardListener()
         # Add this to the create_widgets method
         self.chord_listener_var = tk.BooleanVar()
@@ -41,10 +86,35 @@ class Music21Module:
         self.load_button = Button(
             self.master, text="Load Score", command=self.load_score)
         self.load_button.pack()
+        self.cancel_load_button = Button(
+            self.master, text="Cancel Load", command=self.cancel_load, state=tk.DISABLED)
+        self.cancel_load_button.pack()
+        self.load_status_label = tk.Label(self.master, text="")
+        self.load_status_label.pack()
+        # Rendering through MuseScore is slow, so it is opt-in and runs off the Tk thread
+        self.render_on_load_var = tk.BooleanVar()
+        self.render_on_load_toggle = tk.Checkbutton(
+            self.master, text="Show Score on Load", variable=self.render_on_load_var)
+        self.render_on_load_toggle.pack()
+        self.show_score_button = Button(
+            self.master, text="Show Score", command=self.show_score)
+        self.show_score_button.pack()
 
         self.play_button = Button(
             self.master, text="Play Score", command=self.toggle_play_score)
         self.play_button.pack()
+        self.pause_button = Button(
+            self.master, text="Pause", command=self.toggle_pause)
+        self.pause_button.pack()
+        self.rate_scale = tk.Scale(
+            self.master, label="Playback Rate", from_=0.25, to=2.0, resolution=0.05,
+            orient=tk.HORIZONTAL, command=self.set_playback_rate)
+        self.rate_scale.set(self.playback_rate)
+        self.rate_scale.pack()
+        tk.Label(self.master, text="Start at measure (or b<beat>)").pack()
+        self.start_position_var = tk.StringVar(self.master)
+        self.start_position_entry = tk.Entry(self.master, textvariable=self.start_position_var, width=10)
+        self.start_position_entry.pack()
 
         self.chords_button = Button(
             self.master, text="Play Chords", command=self.toggle_play_chords)
@@ -55,6 +125,9 @@ class Music21Module:
         save_button = Button(
             self.master, text="Save Chords to MusicXML", command=self.save_chords)
         save_button.pack()
+        midi_button = Button(
+            self.master, text="Render to MIDI File", command=self.save_midi)
+        midi_button.pack()
         self.scrub_mode_var = tk.BooleanVar()
         self.scrub_mode_toggle = tk.Checkbutton(
             self.master, text="Scrub Mode", variable=self.scrub_mode_var, command=self.toggle_scrub_mode)
@@ -64,6 +137,16 @@ class Music21Module:
         self.send_osc_toggle = tk.Checkbutton(
             self.master, text="Send Chord", variable=self.send_osc_var)
         self.send_osc_toggle.pack()
+        # Simultaneous notes go out as one timetagged OSC bundle, scheduled slightly ahead
+        self.bundle_output_var = tk.BooleanVar()
+        self.bundle_output_toggle = tk.Checkbutton(
+            self.master, text="Timetagged Bundles", variable=self.bundle_output_var)
+        self.bundle_output_toggle.pack()
+        # Stamp key messages with a sequence number and send time, for the latency histograms downstream
+        self.trace_var = tk.BooleanVar()
+        self.trace_toggle = tk.Checkbutton(
+            self.master, text="Trace Latency", variable=self.trace_var, command=self.toggle_tracing)
+        self.trace_toggle.pack()
         # Inside the create_widgets method of Music21Module class
         self.morph_chords_var = tk.BooleanVar()
         self.morph_chords_toggle = tk.Checkbutton(
@@ -74,6 +157,10 @@ class Music21Module:
         self.filter_duplicates_toggle = tk.Checkbutton(
             self.master, text="Filter Duplicate Chords", variable=self.filter_duplicates_var)
         self.filter_duplicates_toggle.pack()
+        # What counts as a duplicate: same notes, same shape transposed, same pitch classes, or a close voicing
+        self.dedupe_mode_var = tk.StringVar(self.master, value='exact')
+        self.dedupe_mode_menu = tk.OptionMenu(self.master, self.dedupe_mode_var, *DEDUPE_MODES)
+        self.dedupe_mode_menu.pack()
 
         self.combine_staves_button = Button(
             self.master, text="Combine Staves", command=self.process_combined_staves)
@@ -85,9 +172,12 @@ class Music21Module:
             self.selected_instrument)
         if combined_stream:
             # Pass filter_duplicates_var directly to extract_chords_from_stream
+            table = EventTable.from_score(combined_stream)
             chords = self.extract_chords_from_stream(
-                combined_stream, self.filter_duplicates_var.get())
+                combined_stream, self.filter_duplicates_var.get(), self.dedupe_mode_var.get(), table)
             self.chords = chords  # Prepare for scrubbing
+            self.chords_table = table
+            self.chords_changed()
             self.current_chord_index = 0  # Reset index for scrubbing
             for chord in chords:
                 print(chord)
@@ -113,16 +203,20 @@ class Music21Module:
     def send_chord_on(self, chord):
         midi_numbers = [note.pitch.midi for note in chord]
         if self.send_osc_var.get():
-            self.client.send_message("/chordOn", midi_numbers)
+            self.client.send_message("/chordOn", midi_numbers, key="/chordOn")
 
     def send_key_on(self, channel, midi_number):
-        self.client.send_message("/keyOnPlay", [channel, midi_number])
+        self.client.send_message("/keyOnPlay", [channel, midi_number] + (self.tracer.stamp() if self.tracer else []))
 
     def send_key_off(self, channel, midi_number):
-        self.client.send_message("/keyOffPlay", [channel, midi_number])
+        self.client.send_message("/keyOffPlay", [channel, midi_number] + (self.tracer.stamp() if self.tracer else []))
 
-    def initialize_osc_client(self, ip='127.0.0.1', port=57120):
-        return udp_client.SimpleUDPClient(ip, port)
+    def toggle_tracing(self):
+        self.tracer = LatencyTracer('music21') if self.trace_var.get() else None
+
+    def initialize_osc_client(self):
+        """Output to self.osc_destinations, sent from the OSC engine's thread through a bounded queue."""
+        return OscOutput(self.osc_engine, self.osc_destinations)
 
     def scrub_forward(self, event=None):
         if self.scrub_mode_var.get() and hasattr(self, 'chords') and self.chords:
@@ -135,86 +229,90 @@ class Music21Module:
             self.current_chord_index = max(self.current_chord_index - 1, 0)
             self.play_current_chord()
 
+    def chords_changed(self):
+        """Reset what is derived from self.chords, voice-lead its steps and pre-encode its scrub datagrams."""
+        self.chord_index = None
+        self.morph_table = MorphTable.from_chords(self.chords)
+        self.chord_datagrams = ChordDatagrams(self.chords, self.client, self.morph_table.values,
+                                              latency=self.bundle_output.latency)
+        self.prev_chord_index = None
+
     def play_current_chord(self):
         if 0 <= self.current_chord_index < len(self.chords):
-            chord = self.chords[self.current_chord_index]
+            index = self.current_chord_index
+            chord = self.chords[index]
+            datagrams = self.chord_datagrams
 
             # Check if Morph Chords is enabled and scrub mode is active
             if not (self.morph_chords_var.get() or self.send_osc_var.get()):
                 # Send key on messages only if Morph Chords is not enabled or not in scrub mode
-                for note in chord:
-                    midi_number = note.pitch.midi
-                    self.send_key_on(0, midi_number)
+                if self.bundle_output_var.get():
+                    # All notes of the chord in one datagram, started together by the receiver
+                    datagrams.send_bundle(datagrams.key_on_bundle[index])
+                elif self.tracer:
+                    # Traced messages carry their send time, so they cannot be pre-encoded
+                    for note in chord:
+                        self.send_key_on(0, note.pitch.midi)
+                else:
+                    datagrams.send_all(datagrams.key_on[index])
 
             # send just the chord on message
             if self.send_osc_var.get():
                 if not self.morph_chords_var.get():
-                    self.send_chord_on(chord)
+                    datagrams.send(datagrams.chord_on[index], "/chordOn")
                     print(f"send_chord_on with {chord} is executed.")
 
             # Morphing logic
             if self.morph_chords_var.get() and self.prev_chord:
-                morph_values = self.calculate_morph_values(
-                    self.prev_chord, chord)
-                self.send_chord_on(chord)  # send chord on message
-                self.send_morph_values(morph_values)  # send morph values
+                datagrams.send(datagrams.chord_on[index], "/chordOn")  # send chord on message
+                if self.prev_chord_index is not None and self.chords[self.prev_chord_index] is self.prev_chord:
+                    morph = datagrams.morph_datagram(self.prev_chord_index, index)
+                    if morph:
+                        datagrams.send(morph, "/morphNotes")  # send morph values
+                else:
+                    self.send_morph_values(self.calculate_morph_values(self.prev_chord, chord))
 
             # Update previous chord and manage key off with a delay
             self.prev_chord = chord
+            self.prev_chord_index = index
+            # Encode the morphs of the next keypresses while waiting for them
+            self.master.after_idle(datagrams.prefetch, index)
             # threading.Timer(1, self.stop_current_chord, args=[chord]).start()
 
     def stop_current_chord(self, chord):
+        datagrams = self.chord_datagrams
+        index = next((i for i, c in enumerate(self.chords) if c is chord), None) \
+            if datagrams and not self.tracer else None
+        if index is not None:
+            if self.bundle_output_var.get():
+                datagrams.send_bundle(datagrams.key_off_bundle[index])
+            else:
+                datagrams.send_all(datagrams.key_off[index])
+            return
+        if self.bundle_output_var.get():
+            self.bundle_output.send_bundle([("/keyOffPlay", [0, note.pitch.midi]) for note in chord])
+            return
         for note in chord:
             midi_number = note.pitch.midi
             self.send_key_off(0, midi_number)
 
         # New method in Music21Module class
     def calculate_morph_values(self, prev_chord, current_chord):
-        morph_values = []
-
-        # Ensuring both chords have the same number of notes
-        while len(prev_chord) < len(current_chord):
-            # Duplicate the last note if necessary
-            prev_chord.append(prev_chord[-1])
-        while len(current_chord) < len(prev_chord):
-            # Duplicate the last note if necessary
-            current_chord.append(current_chord[-1])
-
-        for prev_note, curr_note in zip(prev_chord, current_chord):
-            difference = curr_note.pitch.midi - prev_note.pitch.midi
-
-            # If the difference is more than an octave, abort the operation
-            if abs(difference) > 12:
-                return []
-
-            # Map the difference to MIDI bend values
-            # Mapping -12 to +12 steps to 0-16384
-            bend_value = int(8192 + (difference * 682.6666666666666))
-            morph_values.append(bend_value)
-
-        return morph_values
+        """Morph values of one chord change; steps between self.chords are looked up in self.morph_table instead."""
+        return morph_values(self.get_chord_signature(prev_chord), self.get_chord_signature(current_chord))
 
     def send_morph_values(self, morph_values):
         if morph_values:
-            self.client.send_message("/morphNotes", morph_values)
+            self.client.send_message("/morphNotes", morph_values, key="/morphNotes")
 
-    def load_and_display_score(self, work_name):
-        try:
-            score = converter.parse(work_name).makeNotation()
-            score.show()
-            return score
-        except musicxml.m21ToXml.MusicXMLExportException as e:
-            print(f"Error loading file: {e}")
-            return None
+    def get_event_table(self, score):
+        """Return the EventTable for score, extracting it only if score is not the cached one."""
+        if self.event_table is None or self.event_table.score is not score:
+            self.event_table = EventTable.from_score(score, self.instrument_stave_map)
+        return self.event_table
 
     def get_all_chords(self, score):
-        chords = []
-        for part in score.parts:
-            for measure in part.getElementsByClass('Measure'):
-                for element in measure.notesAndRests:
-                    if element.isChord:
-                        chords.append(element)
-        return chords
+        return self.get_event_table(score).chords()
 
     def save_chords_to_musicxml(self, chords, file_path):
         score = stream.Score()
@@ -233,7 +331,13 @@ class Music21Module:
                 self.playing = True
                 self.stop_playback_flag = False
                 self.update_button_text()
-                threading.Thread(target=self.play_score).start()
+                self.play_score()
+            elif self.load_job and self.load_job.file_path.lower().endswith(('.mxl', '.xml', '.musicxml')):
+                # Still parsing: play straight from the file as measures are decoded, which blocks
+                self.playing = True
+                self.stop_playback_flag = False
+                self.update_button_text()
+                threading.Thread(target=self.play_streamed_score, args=(self.load_job.file_path,)).start()
 
     def toggle_play_chords(self):
         if self.playing:
@@ -247,9 +351,27 @@ class Music21Module:
 
     def stop_playback(self):
         self.stop_playback_flag = True  # Set the flag to signal the playback thread to stop
+        if self.scheduler:
+            self.scheduler.stop()
         self.playing = False
         self.master.after(0, self.update_button_text)
 
+    def toggle_pause(self):
+        scheduler = self.scheduler
+        if not scheduler:
+            return
+        if scheduler.paused:
+            scheduler.resume()
+            self.pause_button.config(text="Pause")
+        else:
+            scheduler.pause()
+            self.pause_button.config(text="Resume")
+
+    def set_playback_rate(self, rate):
+        self.playback_rate = float(rate)
+        if self.scheduler:
+            self.scheduler.set_rate(self.playback_rate)
+
     def update_button_text(self):
         if self.playing:
             self.play_button.config(text="Stop")
@@ -257,6 +379,7 @@ class Music21Module:
         else:
             self.play_button.config(text="Play Score")
             self.chords_button.config(text="Play Chords")
+            self.pause_button.config(text="Pause")
 
     def clear(self):
         self.canvas.delete("all")
@@ -265,190 +388,256 @@ class Music21Module:
         file_path = filedialog.askopenfilename(
             filetypes=[("MusicXML files", "*.mxl"), ("MIDI files", "*.mid")])
         if file_path:
-            self.score = self.load_and_display_score(file_path)
-            self.analyze_score(self.score)
+            if self.load_job:
+                self.load_job.cancel()
+            self.load_job = ScoreLoadJob(
+                file_path, self.score_cache, self.score_analyzer).start()
+            self.cancel_load_button.config(state=tk.NORMAL)
+            self.poll_load_job(self.load_job)
+
+    def cancel_load(self):
+        if self.load_job:
+            self.load_job.cancel()
+            self.load_status_label.config(text="Cancelling...")
+
+    def poll_load_job(self, job):
+        """Apply the background load's progress on the Tk thread; reschedules itself until it finishes."""
+        if job is not self.load_job:
+            return  # Superseded by a newer load
+        for kind, payload in job.poll():
+            if kind == 'stage':
+                self.load_status_label.config(text=f"Loading: {payload}...")
+            elif kind == 'score':
+                # Playback and chord extraction can start from here; the parsed
+                # score is replaced by the notated one when that is ready
+                self.score = payload
+                self.score_path = job.file_path
+                self.event_table = None
+            elif kind == 'notated':
+                self.score = payload
+                self.score_path = job.file_path
+                self.event_table = None
+                if self.render_on_load_var.get():
+                    self.show_score()
+            elif kind == 'analysis':
+                self.analysis = payload
+                self.print_analysis(payload)
+            elif kind == 'catalog':
+                self.instrument_stave_map = self.catalog_instruments(self.score, self.analysis)
+            elif kind == 'events':
+                if payload.score is self.score:
+                    self.event_table = payload
+                    self.analyze_key_track()
+            else:
+                if kind == 'error':
+                    print(f"Error loading file: {payload}")
+                elif kind == 'done':
+                    self.freeze_loaded_objects()
+                self.load_status_label.config(
+                    text={'done': "Loaded.", 'cancelled': "Load cancelled.", 'error': "Load failed."}[kind])
+                self.cancel_load_button.config(state=tk.DISABLED)
+                self.load_job = None
+                return
+        self.master.after(50, self.poll_load_job, job)
+
+    def freeze_loaded_objects(self):
+        """Exempt the objects alive after a load, mostly the score, from later garbage collections.
+
+        A notated score is hundreds of thousands of objects; otherwise every
+        full collection, e.g. one set off while Combine Staves builds its
+        chords, walks all of them. Garbage of the previous score is collected
+        first, so it is not frozen with them.
+        """
+        gc.unfreeze()
+        gc.collect()
+        gc.freeze()
+
+    def show_score(self):
+        """Render the current score through the configured notation program, off the Tk thread."""
+        if self.score:
+            threading.Thread(target=self.score.show, daemon=True).start()
 
     def extract_metadata(self, score):
-        # Initialize default metadata values
-        metadata_info = {
-            'title': "Unknown Title",
-            'composer': "Unknown Composer"
-        }
-
-        # Check if metadata is available
-        if score.metadata:
-            # Attempt to access standard metadata fields
-            metadata_info['title'] = score.metadata.title or metadata_info['title']
-            metadata_info['composer'] = score.metadata.composer or metadata_info['composer']
-
-            # Attempt to access alternative fields or custom metadata
-            if not metadata_info['title'] or not metadata_info['composer']:
-                for field in ['alternativeTitle', 'movementName']:
-                    if getattr(score.metadata, field, None):
-                        metadata_info['title'] = getattr(score.metadata, field)
-                        break
-
-                # Accessing custom or less common composer fields
-                composers = score.metadata.getContributorsByRole('composer')
-                if composers:
-                    metadata_info['composer'] = ', '.join(
-                        [str(c) for c in composers])
-
-        return metadata_info
+        return extract_metadata(score)
 
     def analyze_score(self, score):
         if not score:
             print("No score loaded to analyze.")
             return
 
+        analysis = self.score_analyzer.analyze(score)
+        self.analysis = analysis
+        self.print_analysis(analysis)
+        self.instrument_stave_map = self.catalog_instruments(score, analysis)
+        return analysis
+
+    def analyze_key_track(self, window=None):
+        """Estimate the key of every measure from windows of window measures and print the key changes."""
+        if not self.score:
+            return None
+        if window is not None:
+            self.key_window = window
+        self.key_track = analyze_key_track(self.get_event_table(self.score), self.key_window)
+        print(f"Key changes ({self.key_window}-measure window):")
+        for measure_number, k in self.key_track.changes():
+            print(f"  m.{measure_number}: {k if k else 'no key'}")
+        return self.key_track
+
+    def print_analysis(self, analysis):
         # Extract and print basic score information
-        metadata = self.extract_metadata(score)
-        print(f"Title: {metadata['title']}")
-        print(f"Composer: {metadata['composer']}")
-
-        # Key Signature Analysis
-        key = score.analyze('key')
-        print(f"Estimated key: {key}")
-
-        # Time Signatures
-        time_signatures = set()
-        for elem in score.recurse().getElementsByClass('TimeSignature'):
-            time_signatures.add(str(elem))
-        print(f"Time signatures used: {', '.join(time_signatures)}")
-
-        # Tempos
-        tempos = set()
-        for elem in score.recurse().getElementsByClass('MetronomeMark'):
-            tempos.add(f"{elem.number} BPM")
-        print(f"Tempos found: {', '.join(tempos)}")
-
-        # Parts and Instruments Analysis
+        print(f"Title: {analysis.title}")
+        print(f"Composer: {analysis.composer}")
+        print(f"Estimated key: {analysis.key}")
+        print(f"Time signatures used: {', '.join(analysis.time_signatures)}")
+        print(f"Tempos found: {', '.join(analysis.tempos)}")
+
         print("Parts and Instruments:")
-        for part in score.parts:
-            instr = part.getInstrument()
-            instrument_name = instr.instrumentName or "Unknown Instrument"
-            print(f"- {part.partName or 'Part'}: {instrument_name}")
-
-            # Initialize pitch range variables
-            lowest_pitch = None
-            highest_pitch = None
-
-            # Iterate over all notes and chords to calculate pitch range
-            for element in part.recurse().notesAndRests:
-                pitches = []
-                if element.isNote:
-                    pitches = [element.pitch]
-                elif element.isChord:
-                    pitches = element.pitches
-
-                for pitch in pitches:
-                    if not lowest_pitch or pitch < lowest_pitch:
-                        lowest_pitch = pitch
-                    if not highest_pitch or pitch > highest_pitch:
-                        highest_pitch = pitch
-
-            if lowest_pitch and highest_pitch:
-                print(f"  Pitch range: {lowest_pitch} to {highest_pitch}")
+        for part in analysis.parts:
+            print(f"- {part['name']}: {part['instrument']}")
+            if part['lowest_pitch'] and part['highest_pitch']:
+                print(f"  Pitch range: {part['lowest_pitch']} to {part['highest_pitch']}")
             else:
                 print("  Pitch range: N/A")
-
             # Assuming each Part as one staff unless explicitly divided
             print("  Number of staves: 1")  # Simplified assumption
 
-        # Additional analyses...
-        # Total Measures
-        total_measures = max([len(p.getElementsByClass('Measure'))
-                             for p in score.parts])
-        print(f"Total measures: {total_measures}")
-
-        # Duration
-        total_duration = score.duration
-        print(f"Total duration: {total_duration.quarterLength} quarter notes")
-
-        # Dynamics
-        dynamics = set()
-        for elem in score.recurse().getElementsByClass('Dynamic'):
-            dynamics.add(str(elem.value))
-        print(f"Dynamics used: {', '.join(dynamics)}")
-
-        self.instrument_stave_map = self.catalog_instruments(score)
-
-    def catalog_instruments(self, score):
-        instrument_stave_map = {}
-        first_instrument_set = False  # Flag to check if the first instrument is already set
-
-        for part in score.parts:
-            instrument_name = str(part.getInstrument())
-            if instrument_name not in instrument_stave_map:
-                instrument_stave_map[instrument_name] = [part]
-                if not first_instrument_set:
-                    self.selected_instrument = instrument_name
-                    first_instrument_set = True
-                    print(
-                        f"Default selected instrument set to: {self.selected_instrument}")
-            else:
-                instrument_stave_map[instrument_name].append(part)
+        print(f"Total measures: {analysis.total_measures}")
+        print(f"Total duration: {analysis.duration} quarter notes")
+        print(f"Dynamics used: {', '.join(analysis.dynamics)}")
+
+    def catalog_instruments(self, score, analysis=None):
+        # The analyzer builds the instrument -> parts map during its single traversal
+        if analysis is None:
+            analysis = self.score_analyzer.analyze(score)
+        instrument_stave_map = analysis.instrument_stave_map
+
+        if instrument_stave_map:
+            self.selected_instrument = next(iter(instrument_stave_map))
+            print(
+                f"Default selected instrument set to: {self.selected_instrument}")
 
         return instrument_stave_map
 
-    def play_score(self):
+    def get_playback_render(self):
+        """Return the PlaybackRender of self.score, from memory, the score cache, or by compiling it."""
+        if self.render is not None and self.render_score is self.score:
+            return self.render
+        arrays = self.score_cache.get_arrays(self.score_path, 'render', PlaybackRender.FORMAT_VERSION) \
+            if self.score_path else None
+        if arrays is not None:
+            render = PlaybackRender.from_arrays(arrays)
+        else:
+            # All parts in one time-ordered stream, each on its own MIDI channel
+            render = PlaybackRender.compile(self.get_event_table(self.score), TempoMap.from_score(self.score))
+            if self.score_path and self.load_job is None:  # Only the final, notated score is cached
+                self.score_cache.put_arrays(
+                    self.score_path, 'render', PlaybackRender.FORMAT_VERSION, render.to_arrays())
+        self.render = render
+        self.render_score = self.score
+        return render
+
+    def start_position(self, render):
+        """Seconds to start playback at, from the start entry: a measure number, or b<beat> for a quarter-note offset."""
+        text = self.start_position_var.get().strip() if self.master is not None else ''
+        if not text:
+            return 0.0
+        try:
+            if text.lower().startswith('b'):
+                return render.seconds_at_beat(float(text[1:]))
+            return render.seconds_at_measure(int(text))
+        except ValueError as e:
+            print(f"Invalid start position {text!r}: {e}")
+            return 0.0
+
+    def play_score(self, start=None):
+        """Start playing the score at its notated tempi on the OSC engine's loop; returns immediately.
+
+        start is in seconds; by default it comes from the start position entry.
+        """
         if self.score:
-            channel = 0  # Default MIDI channel
-            for part in self.score.parts:
-                for measure in part.getElementsByClass('Measure'):
-                    if self.stop_playback_flag:
-                        return  # Exit early if stop flag is set
-                    for element in measure.notesAndRests:
-                        duration = element.duration.quarterLength
-                        if element.isNote:
-                            midi_number = element.pitch.midi
-                            self.send_key_on(channel, midi_number)
-                            time.sleep(duration)
-                            self.send_key_off(channel, midi_number)
-                        elif element.isChord:
-                            for note in element:
-                                midi_number = note.pitch.midi
-                                self.send_key_on(channel, midi_number)
-                            time.sleep(duration)
-                            for note in element:
-                                midi_number = note.pitch.midi
-                                self.send_key_off(channel, midi_number)
-                        elif element.isRest:
-                            time.sleep(duration)
-
-    def extract_chords_from_stream(self, stream, filter_duplicates=False):
+            render = self.get_playback_render()
+            if start is None:
+                start = self.start_position(render)
+            if self.bundle_output_var.get():
+                # Timetags keep notes exact, so the scheduler can work further ahead
+                self.scheduler = PlaybackScheduler(
+                    render.events, self.queue_note_event, lookahead=self.bundle_output.latency,
+                    rate=self.playback_rate, flush=self.bundle_output.flush, start=start)
+            else:
+                self.scheduler = PlaybackScheduler(
+                    render.events, self.send_note_event, rate=self.playback_rate, start=start)
+            scheduler = self.scheduler
+            scheduler.start_on(self.osc_engine, lambda: self.tk_bridge.post(self.playback_finished, scheduler))
+
+    def playback_finished(self, scheduler):
+        if scheduler is self.scheduler:
+            self.scheduler = None
+            if not scheduler.stopped:
+                self.stop_playback()
+
+    def send_note_event(self, kind, channel, midi_number, due):
+        if kind == NOTE_ON:
+            self.send_key_on(channel, midi_number)
+        else:
+            self.send_key_off(channel, midi_number)
+
+    def queue_note_event(self, kind, channel, midi_number, due):
+        address = "/keyOnPlay" if kind == NOTE_ON else "/keyOffPlay"
+        self.bundle_output.add(address, [channel, midi_number], due)
+
+    def play_streamed_score(self, file_path):
+        """Play a MusicXML file measure by measure while it is read, without waiting for the full parse."""
+        channel = 0  # Default MIDI channel
+        part_index = None
+        position = 0.0
+        for chunk in iter_measures(file_path):
+            if chunk.part_index != part_index:
+                part_index = chunk.part_index  # Parts play one after another as they are read
+                position = 0.0
+            onsets, durations, midi_groups = element_groups(chunk.events)
+            position = self.play_groups(channel, onsets, durations, midi_groups, position)
+            if position is None:
+                return
+
+    def play_groups(self, channel, onsets, durations, midi_groups, position):
+        """Send each group of notes at its onset; returns the new position, or None if playback was stopped."""
+        for onset, duration, midi_numbers in zip(onsets, durations, midi_groups):
+            if self.stop_playback_flag:
+                return None  # Exit early if stop flag is set
+            if onset > position:
+                time.sleep(onset - position)  # Rest
+            for midi_number in midi_numbers:
+                self.send_key_on(channel, int(midi_number))
+            time.sleep(duration)
+            for midi_number in midi_numbers:
+                self.send_key_off(channel, int(midi_number))
+            position = max(position, onset + duration)
+        return position
+
+    def extract_chords_from_stream(self, stream, filter_duplicates=False, dedupe_mode='exact', table=None):
         """Extract chords from a given music21 stream and optionally filter duplicates.
-        Only include chords that consist of 2 or more notes."""
-        chords = []
-        seen_chords = set()  # For filtering duplicates
-
-        for element in stream.recurse():
-            if isinstance(element, chord.Chord) and len(element) >= 2:  # Check for 2 or more notes
-                # Construct a chord signature for duplicate checking
-                chord_signature = tuple(n.pitch.midi for n in element)
-                if filter_duplicates:
-                    if chord_signature not in seen_chords:
-                        chords.append(element)
-                        seen_chords.add(chord_signature)
-                else:
-                    chords.append(element)
-
-        return chords
+        Only include chords that consist of 2 or more notes. table is the stream's EventTable, if already built."""
+        if table is None:
+            table = EventTable.from_score(stream)
+        if not filter_duplicates or dedupe_mode == 'exact':
+            return table.chords(min_notes=2, unique=filter_duplicates)
+        return ChordIndex.from_table(table, table.chord_element_ids(min_notes=2)).unique_items(dedupe_mode)
 
     def combine_staves_for_instrument(self, instrument_name):
         """Combine staves for the specified instrument into a single stream."""
         if instrument_name in self.instrument_stave_map and len(self.instrument_stave_map[instrument_name]) > 1:
-            combined_score = stream.Score()
-            for part in self.instrument_stave_map[instrument_name]:
-                combined_score.insert(0, part)
-            return combined_score.chordify()
+            staves = {id(part) for part in self.instrument_stave_map[instrument_name]}
+            part_indices = [i for i, part in enumerate(self.score.parts) if id(part) in staves]
+            # Sweep-line merge over the event table; equivalent to chordify()
+            return merge_staves(self.get_event_table(self.score), part_indices)
         else:
             print(f"No multiple streams to combine for {instrument_name}")
             return None
 
     def get_chords_from_stream(self, combined_stream):
-        # Use the chordify() method to convert the combined stream into a series of chords
-        chordified_stream = combined_stream.chordify()
+        # Merge the combined stream's staves into a series of chords (as chordify() would)
+        table = EventTable.from_score(combined_stream)
+        chordified_stream = merge_staves(table, list(range(table.part_count)))
 
         # Initialize a list to hold the extracted chords
         chords = []
@@ -470,21 +659,29 @@ class Music21Module:
             chords = self.get_all_chords(self.score)
 
             if self.filter_duplicates_var.get():
-                chords = self.filter_duplicate_chords(chords)
+                chords = self.filter_duplicate_chords(chords, self.dedupe_mode_var.get())
             self.chords = chords
+            self.chords_table = self.event_table
+            self.chords_changed()
             self.current_chord_index = 0  # Reset the index whenever a new score is loaded
 
-    def filter_duplicate_chords(self, chords):
-        unique_chords = []
-        seen_chords = set()
+    def filter_duplicate_chords(self, chords, mode='exact', tolerance=0):
+        """Drop chords that duplicate an earlier one under mode (see chord_index.DEDUPE_MODES)."""
+        return self.build_chord_index(chords).unique_items(mode, tolerance)
 
-        for chord in chords:
-            chord_signature = self.get_chord_signature(chord)
-            if chord_signature not in seen_chords:
-                unique_chords.append(chord)
-                seen_chords.add(chord_signature)
+    def build_chord_index(self, chords):
+        # Chords taken from the event table are indexed from its signature matrix
+        element_ids = self.event_table.element_ids_of(chords) if self.event_table else None
+        if element_ids is not None:
+            return ChordIndex.from_table(self.event_table, element_ids)
+        return ChordIndex.from_chords(chords)
 
-        return unique_chords
+    def find_similar_chords(self, chord, k=5):
+        """Return the k chords of self.chords closest to chord by voice leading, with their distances."""
+        if self.chord_index is None:
+            self.chord_index = self.build_chord_index(self.chords)
+        indices, distances = self.chord_index.nearest(self.get_chord_signature(chord), k)
+        return [(self.chords[i], int(d)) for i, d in zip(indices, distances)]
 
     def get_chord_signature(self, chord):
         return tuple(n.pitch.midi for n in chord)
@@ -496,15 +693,13 @@ class Music21Module:
 
     # Modification in the play_chords method
     def play_chords(self):
-        prev_chord = None
-        for chord in self.chords:
+        morph_table = self.morph_table
+        for index, chord in enumerate(self.chords):
             # [Existing code to play the chord...]
 
-            if self.morph_chords_var.get() and prev_chord:
-                morph_values = self.calculate_morph_values(prev_chord, chord)
-                self.send_morph_values(morph_values)
+            if self.morph_chords_var.get() and index:
+                self.send_morph_values(morph_table.values(index - 1, index))
 
-            prev_chord = chord  # Update the previous chord for the next iteration
             if self.stop_playback_flag:
                 break
 
@@ -515,6 +710,30 @@ class Music21Module:
             if file_path:
                 self.save_chords_to_musicxml(self.chords, file_path)
 
+    def save_midi(self):
+        if self.score:
+            file_path = filedialog.asksaveasfilename(defaultextension=".mid", filetypes=[
+                                                    ("MIDI files", "*.mid")])
+            if file_path:
+                self.render_midi_file(file_path)
+
+    def render_midi_file(self, file_path, include_chords=True):
+        """Write what play_score would send, plus the chords with their morphs, to a Standard MIDI File.
+
+        Runs offline, as fast as it can. The chords are self.chords, or all chords of the score if none are loaded.
+        """
+        render = self.get_playback_render()
+        chords = None
+        if include_chords and getattr(self, 'chords', None):
+            element_ids = self.chords_table.element_ids_of(self.chords) if self.chords_table else None
+            if element_ids is None:
+                print("The loaded chords are not in an event table; the MIDI file is written without them")
+            else:
+                chords = score_chords(self.chords_table, element_ids)
+        elif include_chords:
+            chords = score_chords(self.get_event_table(self.score))
+        render_midi(render, file_path, chords)
+
 # Additional functions
 
 
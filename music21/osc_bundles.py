@@ -0,0 +1,57 @@
+import threading
+import time
+from pythonosc import osc_bundle_builder, osc_message_builder
+
+
+def build_bundle(messages, timestamp):
+    """Pack (address, args) messages into one OscBundle timetagged with timestamp (system time)."""
+    bundle = osc_bundle_builder.OscBundleBuilder(timestamp)
+    for address, args in messages:
+        message = osc_message_builder.OscMessageBuilder(address=address)
+        for arg in args:
+            message.add_arg(arg)
+        bundle.add_content(message.build())
+    return bundle.build()
+
+
+class BundleOutput:
+    """Sends OSC messages as timetagged bundles: one datagram per due time instead of one per message.
+
+    Due times are time.monotonic() values, as PlaybackScheduler produces
+    them. Each is converted to system time at flush and pushed latency
+    seconds into the future. The receiver can then start every message of
+    a bundle at exactly the same time, even when the sender runs ahead of
+    real time.
+
+    add() and flush() may be called from one thread while send_bundle() is
+    called from another; send_bundle() does not touch the queued messages.
+    """
+
+    def __init__(self, client, latency=0.05):
+        self.client = client
+        self.latency = latency
+        self.pending = {}  # Due time -> list of (address, args)
+        self.lock = threading.Lock()
+
+    def add(self, address, args, due=None):
+        """Queue a message for the bundle of its due time; None means as soon as possible."""
+        with self.lock:
+            self.pending.setdefault(due, []).append((address, args))
+
+    def flush(self):
+        """Send the queued messages, one bundle per distinct due time."""
+        with self.lock:
+            pending, self.pending = self.pending, {}
+        if not pending:
+            return
+        now = time.monotonic()
+        to_system_time = time.time() - now
+        for due, messages in sorted(pending.items(), key=lambda item: now if item[0] is None else item[0]):
+            moment = now if due is None else due
+            self.client.send(build_bundle(messages, moment + to_system_time + self.latency))
+
+    def send_bundle(self, messages, due=None):
+        """Send (address, args) messages together in one bundle right away, apart from the queued ones."""
+        now = time.monotonic()
+        moment = now if due is None else due
+        self.client.send(build_bundle(messages, moment + time.time() - now + self.latency))
@@ -0,0 +1,139 @@
+import asyncio
+import collections
+import socket
+import threading
+from pythonosc import osc_message_builder, osc_server
+
+
+class OscSender:
+    """Sends OSC to one destination from the engine's loop; a drop-in for SimpleUDPClient.
+
+    send() and send_message() may be called from any thread. Datagrams are
+    written by the loop thread, which owns the socket.
+    """
+
+    def __init__(self, engine, address, port):
+        self.engine = engine
+        self.destination = (address, port)
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setblocking(False)
+
+    def send_message(self, address, value):
+        message = osc_message_builder.OscMessageBuilder(address=address)
+        for arg in value if isinstance(value, (list, tuple)) else [value]:
+            message.add_arg(arg)
+        self.send(message.build())
+
+    def send(self, content):
+        """Send an OscMessage or OscBundle."""
+        self.send_datagram(content.dgram)
+
+    def send_datagram(self, datagram):
+        self.engine.call_soon(self._write, datagram)
+
+    def _write(self, datagram):
+        try:
+            self.sock.sendto(datagram, self.destination)
+        except OSError as e:
+            print(f"OSC send to {self.destination} failed: {e}")
+
+    def close(self):
+        self.engine.call_soon(self.sock.close)
+
+
+class OscEndpoint:
+    """An OSC receiver served by the engine's loop; close() stops it."""
+
+    def __init__(self, engine, transport):
+        self.engine = engine
+        self.transport = transport
+
+    def close(self):
+        self.engine.call_soon(self.transport.close)
+
+
+class OscEngine:
+    """One asyncio event loop, on one daemon thread, for all OSC traffic of the process.
+
+    Senders, receivers (whose dispatcher handlers run on the loop thread)
+    and playback schedulers all share it, instead of each starting its own
+    server or timer threads. The loop's clock is time.monotonic().
+    """
+
+    _shared = None
+    _shared_lock = threading.Lock()
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self._run, name="osc-engine", daemon=True)
+
+    @classmethod
+    def shared(cls):
+        """The process-wide engine, started on first use."""
+        with cls._shared_lock:
+            if cls._shared is None:
+                cls._shared = cls().start()
+            return cls._shared
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def in_loop_thread(self):
+        return threading.current_thread() is self.thread
+
+    def call_soon(self, callback, *args):
+        """Run callback(*args) on the loop thread; directly if already on it."""
+        if self.in_loop_thread():
+            callback(*args)
+        else:
+            self.loop.call_soon_threadsafe(callback, *args)
+
+    def call_at(self, when, callback, *args):
+        """Run callback(*args) on the loop at monotonic time when; must be called on the loop thread."""
+        return self.loop.call_at(when, callback, *args)
+
+    def time(self):
+        return self.loop.time()
+
+    def sender(self, address, port):
+        return OscSender(self, address, port)
+
+    def serve(self, address, port, dispatcher):
+        """Start receiving OSC on (address, port); blocks until the socket is bound, then returns an OscEndpoint."""
+        server = osc_server.AsyncIOOSCUDPServer((address, port), dispatcher, self.loop)
+        transport, _ = asyncio.run_coroutine_threadsafe(server.create_serve_endpoint(), self.loop).result()
+        return OscEndpoint(self, transport)
+
+
+class TkBridge:
+    """Hands callbacks from the engine's thread to the Tk main loop without polling.
+
+    post() queues a callback and schedules one after_idle drain only when
+    the queue goes from empty to non-empty. A burst of OSC messages therefore
+    costs a single Tk wakeup, and an idle app costs nothing.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self.pending = collections.deque()
+        self.lock = threading.Lock()
+
+    def post(self, callback, *args):
+        with self.lock:
+            was_empty = not self.pending
+            self.pending.append((callback, args))
+        if was_empty:
+            self.root.after_idle(self.drain)
+
+    def drain(self):
+        while True:
+            with self.lock:
+                if not self.pending:
+                    return
+                callback, args = self.pending.popleft()
+            callback(*args)
@@ -0,0 +1,153 @@
+import collections
+import socket
+import threading
+from pythonosc import osc_message_builder
+
+DROP_NEWEST = 'drop-newest'
+DROP_OLDEST = 'drop-oldest'
+COALESCE = 'coalesce'
+POLICIES = (DROP_NEWEST, DROP_OLDEST, COALESCE)
+NOTE_OFF_ADDRESSES = ('/keyOffPlay', '/keyOff')
+
+
+class OscOutput:
+    """Sends OSC to several named destinations from the engine's loop thread, through a bounded queue.
+
+    send(), send_message() and send_datagram() may be called from any
+    thread and never block. They queue the datagram, and the loop thread
+    writes it to every destination. The loop is woken only when the queue
+    goes from empty to non-empty.
+
+    When maxsize datagrams are already waiting, policy decides:
+
+        drop-newest  the new datagram is discarded
+        drop-oldest  the oldest waiting datagram is discarded
+        coalesce     like drop-oldest; in addition, a datagram sent with a
+                     key replaces a waiting one with the same key, as a newer
+                     state makes an unsent older one pointless
+
+    Datagrams with a message to one of the protected addresses (note-offs
+    by default) are never dropped, since a lost note-off leaves a note stuck
+    on the synth. They are queued even beyond maxsize, and drop-oldest
+    discards the oldest unprotected datagram instead.
+
+    stats() reports the datagrams sent to each destination and the ones
+    dropped, coalesced or failed.
+    """
+
+    def __init__(self, engine, destinations, maxsize=1024, policy=COALESCE, protected=NOTE_OFF_ADDRESSES):
+        """destinations maps names to (address, port), e.g. {'synth': ('127.0.0.1', 57120)}."""
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown policy {policy!r}; expected one of {POLICIES}")
+        self.engine = engine
+        self.destinations = dict(destinations)  # Replaced, never mutated, so the loop thread can iterate it
+        self.maxsize = maxsize
+        self.policy = policy
+        self.queue = collections.deque()  # [datagram, key, protected] entries
+        # An OSC address is null-terminated in the datagram, alone or in a bundle
+        self.protected = tuple(address.encode() + b'\0' for address in protected)
+        self.keyed = {}  # Key -> its waiting entry
+        self.lock = threading.Lock()
+        self.scheduled = False  # A drain is pending on the loop
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setblocking(False)
+        self.sent = collections.Counter()  # Destination name -> datagrams sent
+        self.dropped = 0
+        self.coalesced = 0
+        self.errors = 0
+
+    def add_destination(self, name, address, port):
+        with self.lock:
+            self.destinations = {**self.destinations, name: (address, port)}
+
+    def remove_destination(self, name):
+        with self.lock:
+            self.destinations = {n: d for n, d in self.destinations.items() if n != name}
+
+    def send_message(self, address, value, key=None):
+        message = osc_message_builder.OscMessageBuilder(address=address)
+        for arg in value if isinstance(value, (list, tuple)) else [value]:
+            message.add_arg(arg)
+        self.send_datagram(message.build().dgram, key)
+
+    def send(self, content, key=None):
+        """Send an OscMessage or OscBundle."""
+        self.send_datagram(content.dgram, key)
+
+    def is_protected(self, datagram):
+        return any(address in datagram for address in self.protected)
+
+    def send_datagram(self, datagram, key=None):
+        protected = self.is_protected(datagram)
+        with self.lock:
+            if key is not None and self.policy == COALESCE:
+                entry = self.keyed.get(key)
+                if entry is not None and entry[2] <= protected:
+                    entry[0] = datagram
+                    entry[2] = protected
+                    self.coalesced += 1
+                    return
+            if len(self.queue) >= self.maxsize and not self._make_room(protected):
+                self.dropped += 1
+                return
+            entry = [datagram, key, protected]
+            self.queue.append(entry)
+            if key is not None:
+                self.keyed[key] = entry
+            wake = not self.scheduled
+            self.scheduled = True
+        if wake:
+            self.engine.loop.call_soon_threadsafe(self._drain)
+
+    def _make_room(self, protected):
+        """Apply the policy to a full queue; return whether the new datagram is to be queued."""
+        if self.policy != DROP_NEWEST:
+            for index, entry in enumerate(self.queue):
+                if not entry[2]:
+                    del self.queue[index]
+                    self._forget(entry)
+                    self.dropped += 1
+                    return True
+        return protected
+
+    def _forget(self, entry):
+        if entry[1] is not None and self.keyed.get(entry[1]) is entry:
+            del self.keyed[entry[1]]
+
+    def _drain(self):
+        sent, dropped, errors = [], 0, 0  # Outcome of the last datagram, counted under the lock
+        while True:
+            with self.lock:
+                self.sent.update(sent)
+                self.dropped += dropped
+                self.errors += errors
+                sent, dropped, errors = [], 0, 0
+                if not self.queue:
+                    self.scheduled = False
+                    return
+                entry = self.queue.popleft()
+                self._forget(entry)
+                destinations = self.destinations
+            for name, destination in destinations.items():
+                try:
+                    self.sock.sendto(entry[0], destination)
+                    sent.append(name)
+                except BlockingIOError:
+                    dropped += 1  # The socket buffer is full
+                except OSError as e:
+                    errors += 1
+                    print(f"OSC send to {name} {destination} failed: {e}")
+
+    def stats(self):
+        with self.lock:
+            return {
+                'sent': dict(self.sent),
+                'dropped': self.dropped,
+                'coalesced': self.coalesced,
+                'errors': self.errors,
+                'queued': len(self.queue),
+            }
+
+    def close(self):
+        """Close the socket once the datagrams already queued have gone out."""
+        self.engine.loop.call_soon_threadsafe(self.sock.close)
@@ -0,0 +1,141 @@
+import math
+import time
+
+TRACE_ARGS = 3  # seq, origin_us, sent_us appended to a traced message
+WRAP = 1 << 31  # Timestamps wrap to stay int32, which every OSC peer understands
+BUCKETS_PER_OCTAVE = 16
+BUCKET_COUNT = 32 * BUCKETS_PER_OCTAVE
+
+
+def now_us():
+    """time.monotonic() in whole microseconds, wrapped to 31 bits.
+
+    The monotonic clock is shared by all processes on a machine, so stamps
+    taken by different apps on one host can be subtracted.
+    """
+    return (time.monotonic_ns() // 1000) % WRAP
+
+
+def elapsed_us(since_us, until_us):
+    return (until_us - since_us) % WRAP
+
+
+def split_trace(args, payload_count):
+    """Split a message's arguments into its payload and its trace (a tuple, or None if untraced)."""
+    trace = args[payload_count:payload_count + TRACE_ARGS]
+    return args[:payload_count], tuple(trace) if len(trace) == TRACE_ARGS else None
+
+
+class LatencyHistogram:
+    """Counts of latencies in log-spaced buckets, about 4% wide; percentiles are bucket upper bounds."""
+
+    def __init__(self):
+        self.counts = [0] * BUCKET_COUNT
+        self.count = 0
+        self.max = 0
+
+    @staticmethod
+    def bucket(us):
+        return min(int(math.log2(us + 1) * BUCKETS_PER_OCTAVE), BUCKET_COUNT - 1)
+
+    def add(self, us):
+        self.counts[self.bucket(us)] += 1
+        self.count += 1
+        self.max = max(self.max, us)
+
+    def percentile(self, fraction):
+        """Upper bound, in microseconds, of the latency below which fraction of the samples fall."""
+        if not self.count:
+            return 0
+        rank = math.ceil(fraction * self.count)
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return min(int(2 ** ((index + 1) / BUCKETS_PER_OCTAVE)) - 1, self.max)
+        return self.max
+
+
+class LatencyTracer:
+    """Trace metadata for OSC messages and the latency histograms of one app.
+
+    A traced message carries three extra int arguments after its payload:
+    a sequence number, the time it left its origin and the time it left the
+    previous hop (see now_us()). Receivers that do not know about tracing
+    ignore them. An app that originates messages appends stamp(); a hop
+    that forwards them records receive() and appends forward(trace).
+
+    The histograms are printed every dump_interval seconds while new
+    samples arrive. A peer can also query them: serve() answers
+    "/trace/query" with a "/trace/report" message of (hop, count, p50 µs,
+    p99 µs, max µs) groups, sent to the querying address.
+    """
+
+    def __init__(self, name, engine=None, dump_interval=None):
+        self.name = name
+        self.engine = engine
+        self.seq = 0
+        self.histograms = {}
+        self.dumped_count = 0
+        self.dump_interval = dump_interval
+        if engine is not None and dump_interval:
+            engine.call_soon(self._schedule_dump)
+
+    def stamp(self):
+        """Trace arguments for a message that starts here."""
+        self.seq = (self.seq + 1) % WRAP
+        now = now_us()
+        return [self.seq, now, now]
+
+    def forward(self, trace):
+        """Trace arguments for passing a received message on."""
+        seq, origin, _ = trace
+        return [seq, origin, now_us()]
+
+    def receive(self, hop, trace):
+        """Record the latency of the hop a traced message just made, and its latency from the origin."""
+        now = now_us()
+        _, origin, sent = trace
+        self.record(hop, elapsed_us(sent, now))
+        if origin != sent:
+            self.record('end_to_end', elapsed_us(origin, now))
+
+    def record(self, hop, us):
+        histogram = self.histograms.get(hop)
+        if histogram is None:
+            histogram = self.histograms[hop] = LatencyHistogram()
+        histogram.add(us)
+
+    def summary(self):
+        """{hop: (count, p50 µs, p99 µs, max µs)}"""
+        return {hop: (h.count, h.percentile(0.5), h.percentile(0.99), h.max)
+                for hop, h in sorted(self.histograms.items())}
+
+    def report(self):
+        lines = [f"Latency trace of {self.name}:"]
+        for hop, (count, p50, p99, worst) in self.summary().items():
+            lines.append(f"  {hop}: n={count} p50={p50 / 1000:.2f}ms p99={p99 / 1000:.2f}ms max={worst / 1000:.2f}ms")
+        return "\n".join(lines)
+
+    def serve(self, dispatcher):
+        """Answer "/trace/query" messages arriving through dispatcher; needs the engine."""
+        dispatcher.map("/trace/query", self.query_handler, needs_reply_address=True)
+
+    def query_handler(self, client_address, address, *args):
+        reply = []
+        for hop, values in self.summary().items():
+            reply.append(hop)
+            reply.extend(values)
+        sender = self.engine.sender(*client_address)
+        sender.send_message("/trace/report", reply)
+        sender.close()
+
+    def _schedule_dump(self):
+        self.engine.call_at(self.engine.time() + self.dump_interval, self._dump)
+
+    def _dump(self):
+        count = sum(h.count for h in self.histograms.values())
+        if count != self.dumped_count:
+            self.dumped_count = count
+            print(self.report())
+        self._schedule_dump()
@@ -0,0 +1,344 @@
+import bisect
+import math
+import threading
+import time
+import numpy as np
+
+NOTE_OFF = 0
+NOTE_ON = 1
+DEFAULT_SECONDS_PER_QUARTER = 0.5  # 120 BPM, music21's default tempo
+
+
+class TempoMap:
+    """Piecewise-constant tempo: converts quarter-length offsets to seconds from the start."""
+
+    def __init__(self, starts, seconds_per_quarter):
+        """starts are the ascending offsets where each tempo takes effect; the first must be 0."""
+        self.starts = np.asarray(starts, dtype='f8')
+        self.seconds_per_quarter = np.asarray(seconds_per_quarter, dtype='f8')
+        # Seconds elapsed at the start of each tempo segment
+        self.start_seconds = np.concatenate(
+            ([0.0], np.cumsum(np.diff(self.starts) * self.seconds_per_quarter[:-1])))
+
+    @classmethod
+    def from_score(cls, score):
+        """Build the map from the score's MetronomeMarks (and text tempos music21 can interpret)."""
+        boundaries = score.metronomeMarkBoundaries()
+        if not boundaries:
+            return cls.constant()
+        return cls([start for start, _, _ in boundaries],
+                   [mark.secondsPerQuarter() or DEFAULT_SECONDS_PER_QUARTER for _, _, mark in boundaries])
+
+    @classmethod
+    def from_marks(cls, marks):
+        """Build the map from (offset, quarter-note BPM) pairs, e.g. MeasureChunk.tempos."""
+        marks = sorted(marks)
+        if not marks or marks[0][0] > 0:
+            marks = [(0.0, 60.0 / DEFAULT_SECONDS_PER_QUARTER)] + marks
+        return cls([offset for offset, _ in marks], [60.0 / bpm for _, bpm in marks])
+
+    @classmethod
+    def constant(cls, seconds_per_quarter=DEFAULT_SECONDS_PER_QUARTER):
+        return cls([0.0], [seconds_per_quarter])
+
+    def seconds(self, offsets):
+        """Seconds from the start of the score at each offset (an array or a single number)."""
+        offsets = np.asarray(offsets, dtype='f8')
+        segment = np.maximum(np.searchsorted(self.starts, offsets, side='right') - 1, 0)
+        return self.start_seconds[segment] + (offsets - self.starts[segment]) * self.seconds_per_quarter[segment]
+
+    def offsets(self, seconds):
+        """Quarter-length offsets reached at each number of seconds from the start; the inverse of seconds()."""
+        seconds = np.asarray(seconds, dtype='f8')
+        segment = np.maximum(np.searchsorted(self.start_seconds, seconds, side='right') - 1, 0)
+        return self.starts[segment] + (seconds - self.start_seconds[segment]) / self.seconds_per_quarter[segment]
+
+
+TIMELINE_DTYPE = np.dtype([
+    ('time', 'f8'),      # Seconds from the start of the score
+    ('kind', 'u1'),      # NOTE_ON or NOTE_OFF
+    ('channel', 'u1'),   # MIDI channel (0-15)
+    ('midi', 'i2'),
+])
+
+MIDI_CHANNELS = 16
+
+
+def merged_timeline(table, tempo_map, channels=None):
+    """Merge the notes of every part of an EventTable into one time-ordered TIMELINE_DTYPE array.
+
+    Each part plays on its own channel: channels[part] if given, otherwise
+    the part index (wrapping after 16 parts). Note-offs sort before
+    note-ons at the same time, so a repeated pitch is released before it is
+    struck again.
+    """
+    events = table.events
+    if channels is None:
+        channels = np.arange(max(table.part_count, 1)) % MIDI_CHANNELS
+    channel = np.asarray(channels, dtype='u1')[events['part']]
+    count = len(events)
+    timeline = np.empty(2 * count, dtype=TIMELINE_DTYPE)
+    timeline['time'][:count] = tempo_map.seconds(events['onset'])
+    timeline['time'][count:] = tempo_map.seconds(events['onset'] + events['duration'])
+    timeline['kind'][:count] = NOTE_ON
+    timeline['kind'][count:] = NOTE_OFF
+    timeline['channel'] = np.tile(channel, 2)
+    timeline['midi'] = np.tile(events['midi'], 2)
+    return timeline[np.lexsort((timeline['midi'], timeline['channel'], timeline['kind'], timeline['time']))]
+
+
+def timeline_events(timeline):
+    """Convert a TIMELINE_DTYPE array to (seconds, kind, channel, midi) tuples.
+
+    Plain tuples are much cheaper to index one at a time than NumPy records.
+    """
+    return list(zip(timeline['time'].tolist(), timeline['kind'].tolist(),
+                    timeline['channel'].tolist(), timeline['midi'].tolist()))
+
+
+class PlaybackRender:
+    """A score compiled once for playback: its merged timeline plus what is needed to seek in it.
+
+    Seeking to a time, a quarter-length offset ("beat") or a measure number
+    is a binary search. to_arrays()/from_arrays() let the render be stored
+    next to the score in the ScoreCache. Notes already sounding at a seek
+    point are not re-struck.
+    """
+
+    # Part of the cache key of stored renders; bump it whenever compile(), merged_timeline()
+    # or the channel mapping changes what a score renders to, so older renders are not reused
+    FORMAT_VERSION = 1
+
+    def __init__(self, timeline, tempo_map, measure_offsets, measure_numbers):
+        self.timeline = timeline
+        self.tempo_map = tempo_map
+        self.measure_offsets = np.asarray(measure_offsets, dtype='f8')
+        self.measure_numbers = np.asarray(measure_numbers, dtype='i4')
+        self.measure_order = np.argsort(self.measure_numbers, kind='stable')
+        self._events = None
+
+    @classmethod
+    def compile(cls, table, tempo_map, channels=None):
+        return cls(merged_timeline(table, tempo_map, channels), tempo_map,
+                   table.measure_offsets, table.measure_numbers)
+
+    def to_arrays(self):
+        return {
+            'timeline': self.timeline,
+            'tempo_starts': self.tempo_map.starts,
+            'tempo_seconds_per_quarter': self.tempo_map.seconds_per_quarter,
+            'measure_offsets': self.measure_offsets,
+            'measure_numbers': self.measure_numbers,
+        }
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        tempo_map = TempoMap(arrays['tempo_starts'], arrays['tempo_seconds_per_quarter'])
+        return cls(arrays['timeline'], tempo_map, arrays['measure_offsets'], arrays['measure_numbers'])
+
+    @property
+    def events(self):
+        """The timeline as a list of (seconds, kind, channel, midi) tuples, built once for the scheduler."""
+        if self._events is None:
+            self._events = timeline_events(self.timeline)
+        return self._events
+
+    @property
+    def duration(self):
+        return float(self.timeline['time'][-1]) if len(self.timeline) else 0.0
+
+    def seconds_at_beat(self, offset):
+        """Seconds from the start at a quarter-length offset."""
+        return float(self.tempo_map.seconds(offset))
+
+    def seconds_at_measure(self, number):
+        """Seconds from the start of the first measure numbered number; ValueError if there is none."""
+        position = np.searchsorted(self.measure_numbers[self.measure_order], number)
+        if position >= len(self.measure_order) or self.measure_numbers[self.measure_order[position]] != number:
+            raise ValueError(f"No measure {number}")
+        return self.seconds_at_beat(self.measure_offsets[self.measure_order[position]])
+
+    def measure_at(self, seconds):
+        """Number of the measure playing at seconds, or None if the score has no measures."""
+        if not len(self.measure_offsets):
+            return None
+        offsets = self.tempo_map.seconds(self.measure_offsets)
+        index = max(int(np.searchsorted(offsets, seconds, side='right')) - 1, 0)
+        return int(self.measure_numbers[index])
+
+
+class PlaybackScheduler:
+    """Plays a timeline of note events against the monotonic clock.
+
+    Every event has an absolute time, and the clock is re-read before each
+    dispatch. Sleep jitter and OSC send cost therefore delay single events
+    but never accumulate. On waking for an event, the scheduler also
+    dispatches the events due within the next lookahead seconds, in one
+    batch. send(kind, channel, midi, due) receives the monotonic time
+    at which each one should sound. If flush is given, it is called after
+    each batch, so a sender can pack a batch into bundles.
+
+    It runs either on a thread of its own (run()) or as callbacks on an
+    OscEngine loop (start_on()). pause(), resume(), set_rate() and stop()
+    may be called from any thread. A threaded scheduler wakes at least every
+    max_sleep seconds to notice them; one on a loop is woken explicitly.
+    """
+
+    def __init__(self, timeline, send, lookahead=0.002, max_sleep=0.05, rate=1.0, flush=None, start=0.0):
+        """timeline is a TIMELINE_DTYPE array (or a list of (seconds, kind, channel, midi)) sorted by time.
+
+        Playback begins at start seconds into the timeline.
+        """
+        if isinstance(timeline, np.ndarray):
+            timeline = timeline_events(timeline)
+        self.timeline = timeline
+        self.send = send
+        self.flush = flush  # Called after each batch of sends, e.g. BundleOutput.flush
+        self.lookahead = lookahead
+        self.max_sleep = max_sleep
+        self.rate = rate
+        self.index = bisect.bisect_left(timeline, (start,))  # Next event to dispatch
+        self.position = start  # Score seconds at self.anchor
+        self.anchor = None  # Monotonic time at which the score was at self.position
+        self.paused = False
+        self.stopped = False
+        self.finished = False
+        self.sounding = set()  # (channel, midi) of notes on
+        self.last_due = -math.inf  # Latest due time dispatched; events can be sent up to lookahead early
+        self.condition = threading.Condition()
+        self.engine = None
+        self.on_finish = None
+        self.timer = None  # Loop handle of the next step() when running on an engine
+
+    def score_time(self, now):
+        """Score seconds reached at monotonic time now."""
+        if self.paused or self.anchor is None:
+            return self.position
+        return self.position + (now - self.anchor) * self.rate
+
+    def due_time(self, score_seconds):
+        """Monotonic time at which score_seconds will be reached at the current rate."""
+        return self.anchor + (score_seconds - self.position) / self.rate
+
+    def step(self, now):
+        """Dispatch the events due by now; return the monotonic time of the next call, or None when finished.
+
+        Returns math.inf while paused. Must be called with self.condition held.
+        """
+        if self.stopped or self.index >= len(self.timeline):
+            if not self.finished:
+                self.finished = True
+                self.release_all()
+            return None
+        if self.paused:
+            return math.inf
+        horizon = self.score_time(now) + self.lookahead * self.rate
+        while self.index < len(self.timeline) and self.timeline[self.index][0] <= horizon:
+            seconds, kind, channel, midi = self.timeline[self.index]
+            self.dispatch(kind, channel, midi, self.due_time(seconds))
+            self.index += 1
+        if self.flush:
+            self.flush()
+        if self.index >= len(self.timeline):
+            return now
+        return self.due_time(self.timeline[self.index][0])
+
+    def run(self):
+        """Play to the end, or until stop(); blocks the calling thread."""
+        with self.condition:
+            self.anchor = time.monotonic()
+            while True:
+                wake = self.step(time.monotonic())
+                if wake is None:
+                    break
+                if wake == math.inf:
+                    self.condition.wait()
+                    continue
+                wait = wake - time.monotonic()
+                if wait > 0:
+                    self.condition.wait(min(wait, self.max_sleep))
+
+    def start_on(self, engine, on_finish=None):
+        """Play on an OscEngine's loop without blocking; on_finish() is called on the loop thread at the end."""
+        self.engine = engine
+        self.on_finish = on_finish
+        engine.call_soon(self._start)
+
+    def _start(self):
+        with self.condition:
+            self.anchor = self.engine.time()
+        self._tick()
+
+    def _tick(self):
+        if self.timer:
+            self.timer.cancel()
+            self.timer = None
+        if self.finished:
+            return
+        with self.condition:
+            wake = self.step(self.engine.time())
+        if wake is None:
+            if self.on_finish:
+                self.on_finish()
+        elif wake != math.inf:
+            self.timer = self.engine.call_at(wake, self._tick)
+
+    def _wake(self):
+        """Re-run step() soon after a state change from another thread."""
+        self.condition.notify_all()
+        if self.engine is not None:
+            self.engine.call_soon(self._tick)
+
+    def dispatch(self, kind, channel, midi, due):
+        if kind == NOTE_ON:
+            self.sounding.add((channel, midi))
+        else:
+            self.sounding.discard((channel, midi))
+        self.last_due = max(self.last_due, due)
+        self.send(kind, channel, midi, due)
+
+    def release_all(self):
+        """Send note-offs for the sounding notes, due no earlier than any event already sent.
+
+        A note-on dispatched ahead of its due time may not have sounded yet;
+        an earlier note-off would reach the receiver first and leave it hanging.
+        """
+        due = max(time.monotonic(), self.last_due)
+        for channel, midi in sorted(self.sounding):
+            self.send(NOTE_OFF, channel, midi, due)
+        self.sounding.clear()
+        if self.flush:
+            self.flush()
+
+    def _reanchor(self):
+        now = time.monotonic()
+        self.position = self.score_time(now)
+        self.anchor = now
+
+    def pause(self):
+        with self.condition:
+            if not self.paused:
+                self._reanchor()
+                self.paused = True
+                self.release_all()  # Notes would otherwise hang for the whole pause
+                self._wake()
+
+    def resume(self):
+        with self.condition:
+            if self.paused:
+                self.paused = False
+                self.anchor = time.monotonic()
+                self._wake()
+
+    def set_rate(self, rate):
+        """Change the playback speed (1.0 is the notated tempo) without jumping position."""
+        with self.condition:
+            if not self.paused and self.anchor is not None:
+                self._reanchor()
+            self.rate = rate
+            self._wake()
+
+    def stop(self):
+        with self.condition:
+            self.stopped = True
+            self._wake()
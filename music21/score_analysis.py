@@ -0,0 +1,291 @@
+from music21 import analysis, key, pitch, stream
+
+
+def extract_metadata(score):
+    # Initialize default metadata values
+    metadata_info = {
+        'title': "Unknown Title",
+        'composer': "Unknown Composer"
+    }
+
+    # Check if metadata is available
+    if score.metadata:
+        # Attempt to access standard metadata fields
+        metadata_info['title'] = score.metadata.title or metadata_info['title']
+        metadata_info['composer'] = score.metadata.composer or metadata_info['composer']
+
+        # Attempt to access alternative fields or custom metadata
+        if not metadata_info['title'] or not metadata_info['composer']:
+            for field in ['alternativeTitle', 'movementName']:
+                if getattr(score.metadata, field, None):
+                    metadata_info['title'] = getattr(score.metadata, field)
+                    break
+
+            # Accessing custom or less common composer fields
+            composers = score.metadata.getContributorsByRole('composer')
+            if composers:
+                metadata_info['composer'] = ', '.join(
+                    [str(c) for c in composers])
+
+    return metadata_info
+
+
+class ScoreAnalysis:
+    """Structured result of a ScoreAnalyzer run."""
+
+    def __init__(self):
+        self.title = "Unknown Title"
+        self.composer = "Unknown Composer"
+        self.key = None
+        self.time_signatures = set()
+        self.tempos = set()
+        self.parts = []  # One dict per part: name, instrument, lowest_pitch, highest_pitch, measures
+        self.total_measures = 0
+        self.duration = 0.0
+        self.dynamics = set()
+        self.instrument_stave_map = {}  # Instrument name -> list of Parts, as built by catalog_instruments
+        self.extra = {}  # Results of registered collectors, by collector name
+
+    def to_dict(self):
+        """Return the analysis as a JSON-serializable dict."""
+        summary = {
+            'title': self.title,
+            'composer': self.composer,
+            'key': str(self.key) if self.key else None,
+            'time_signatures': sorted(self.time_signatures),
+            'tempos': sorted(self.tempos),
+            'parts': [
+                {
+                    'name': part['name'],
+                    'instrument': part['instrument'],
+                    'lowest_pitch': str(part['lowest_pitch']) if part['lowest_pitch'] else None,
+                    'highest_pitch': str(part['highest_pitch']) if part['highest_pitch'] else None,
+                    'measures': part['measures'],
+                }
+                for part in self.parts
+            ],
+            'total_measures': self.total_measures,
+            'duration': self.duration,
+            'dynamics': sorted(self.dynamics),
+        }
+        summary.update(self.extra)
+        return summary
+
+
+class Collector:
+    """Base class for statistics gathered during a ScoreAnalyzer traversal.
+
+    classes names the music21 classes whose instances are passed to visit();
+    an empty tuple means the collector only uses start_part() and finish().
+    Collectors other than the built-in ones store their result in
+    analysis.extra[name] from finish().
+    """
+
+    name = None
+    classes = ()
+
+    def start_part(self, part_index, part):
+        pass
+
+    def visit(self, element, part_index):
+        pass
+
+    def finish(self, analysis, score):
+        pass
+
+
+class TimeSignatureCollector(Collector):
+    classes = ('TimeSignature',)
+
+    def __init__(self):
+        self.found = set()
+
+    def visit(self, element, part_index):
+        self.found.add(str(element))
+
+    def finish(self, analysis, score):
+        analysis.time_signatures = self.found
+
+
+class TempoCollector(Collector):
+    classes = ('MetronomeMark',)
+
+    def __init__(self):
+        self.found = set()
+
+    def visit(self, element, part_index):
+        self.found.add(f"{element.number} BPM")
+
+    def finish(self, analysis, score):
+        analysis.tempos = self.found
+
+
+class DynamicsCollector(Collector):
+    classes = ('Dynamic',)
+
+    def __init__(self):
+        self.found = set()
+
+    def visit(self, element, part_index):
+        self.found.add(str(element.value))
+
+    def finish(self, analysis, score):
+        analysis.dynamics = self.found
+
+
+class PartCollector(Collector):
+    """Per-part instrument, pitch range and measure count, plus the instrument catalog."""
+
+    classes = ('NotRest', 'Measure')
+
+    def __init__(self):
+        self.parts = []
+
+    def start_part(self, part_index, part):
+        self.parts.append({
+            'part': part,
+            'name': part.partName or 'Part',
+            'instrument_object': part.getInstrument(),
+            'lowest_pitch': None,
+            'highest_pitch': None,
+            'measures': 0,
+        })
+
+    def visit(self, element, part_index):
+        if part_index is None:
+            return
+        info = self.parts[part_index]
+        if element.isStream:
+            info['measures'] += 1
+            return
+        for p in element.pitches:
+            if not info['lowest_pitch'] or p < info['lowest_pitch']:
+                info['lowest_pitch'] = p
+            if not info['highest_pitch'] or p > info['highest_pitch']:
+                info['highest_pitch'] = p
+
+    def finish(self, analysis, score):
+        for info in self.parts:
+            instr = info.pop('instrument_object')
+            part = info.pop('part')
+            info['instrument'] = instr.instrumentName or "Unknown Instrument"
+            analysis.parts.append(info)
+            analysis.instrument_stave_map.setdefault(str(instr), []).append(part)
+        analysis.total_measures = max([info['measures'] for info in self.parts], default=0)
+
+
+class KeyCollector(Collector):
+    """Duration-weighted pitch-class key estimate, equivalent to score.analyze('key')."""
+
+    classes = ('NotRest',)
+    key_analysis = analysis.discrete.AardenEssen
+
+    def __init__(self):
+        self.distribution = [0.0] * 12
+
+    def visit(self, element, part_index):
+        if 'Unpitched' in element.classSet:
+            return
+        length = element.quarterLength
+        for p in element.pitches:
+            self.distribution[p.pitchClass] += length
+
+    def finish(self, analysis, score):
+        if any(self.distribution):
+            analysis.key = self.best_key(self.distribution)
+
+    def best_key(self, distribution):
+        analyzer = self.key_analysis()
+        candidates = []
+        for mode in ('major', 'minor'):
+            for tonic, coefficient in enumerate(
+                    correlate_profile(distribution, analyzer.getWeights(mode))):
+                candidates.append((coefficient, tonic, mode))
+        coefficient, tonic, mode = max(candidates)
+        return spell_key(analyzer, tonic, mode, coefficient)
+
+
+def spell_key(analyzer, tonic, mode, coefficient):
+    """Build the Key for a tonic pitch class, spelled as the music21 key analyzer would."""
+    tonic_pitch = pitch.Pitch(tonic)
+    valid = analyzer.keysValidMajor if mode == 'major' else analyzer.keysValidMinor
+    if tonic_pitch.name not in valid:
+        tonic_pitch.getEnharmonic(inPlace=True)
+    k = key.Key(tonic=tonic_pitch, mode=mode)
+    k.correlationCoefficient = coefficient
+    return k
+
+
+def correlate_profile(distribution, weights):
+    """Pearson correlation of a pitch-class distribution with a key profile on each of the 12 tonics."""
+    profile_mean = sum(weights) / 12
+    dist_mean = sum(distribution) / 12
+    dist_dev = [d - dist_mean for d in distribution]
+    dist_norm = sum(d * d for d in dist_dev)
+    profile_norm = sum((w - profile_mean) ** 2 for w in weights)
+    coefficients = []
+    for tonic in range(12):
+        top = sum((weights[(j - tonic) % 12] - profile_mean) * dist_dev[j] for j in range(12))
+        if dist_norm == 0 or profile_norm == 0:
+            coefficients.append(0.0)
+        else:
+            coefficients.append(top / (dist_norm * profile_norm) ** 0.5)
+    return coefficients
+
+
+class ScoreAnalyzer:
+    """Computes every analyze_score statistic in a single traversal of the score.
+
+    Additional collectors can be registered per analyzer with register(), or for
+    every analyzer by appending a Collector subclass to default_collectors.
+    """
+
+    default_collectors = [TimeSignatureCollector, TempoCollector, DynamicsCollector,
+                          PartCollector, KeyCollector]
+
+    def __init__(self):
+        self.collector_factories = list(self.default_collectors)
+
+    def register(self, collector_factory):
+        """Add a Collector subclass (or any zero-argument callable returning a Collector)."""
+        self.collector_factories.append(collector_factory)
+
+    def analyze(self, score):
+        collectors = [factory() for factory in self.collector_factories]
+        handlers_by_type = {}
+        result = ScoreAnalysis()
+        metadata_info = extract_metadata(score)
+        result.title = metadata_info['title']
+        result.composer = metadata_info['composer']
+
+        part_index = None
+        part_count = 0
+        for element in score.recurse():
+            if isinstance(element, stream.Part):
+                part_index = part_count
+                part_count += 1
+                for collector in collectors:
+                    collector.start_part(part_index, element)
+                continue
+            if element.activeSite is score:
+                part_index = None  # Score-level element outside any part
+
+            element_type = type(element)
+            handlers = handlers_by_type.get(element_type)
+            if handlers is None:
+                class_set = element.classSet
+                handlers = [c.visit for c in collectors
+                            if any(name in class_set for name in c.classes)]
+                handlers_by_type[element_type] = handlers
+            for handler in handlers:
+                handler(element, part_index)
+
+        result.duration = float(score.duration.quarterLength)
+        for collector in collectors:
+            collector.finish(result, score)
+        return result
+
+
+def summarize_score(score):
+    """Collect the analyze_score statistics for a score as a JSON-serializable dict."""
+    return ScoreAnalyzer().analyze(score).to_dict()
@@ -0,0 +1,145 @@
+import hashlib
+import os
+import numpy as np
+import music21
+from music21 import converter, freezeThaw
+
+
+class ScoreCache:
+    """On-disk cache of parsed, notated scores.
+
+    Entries are keyed by the SHA-256 of the source file's bytes and the installed
+    music21 version, and hold the post-makeNotation() score frozen with music21's
+    own pickle serializer. Named sets of NumPy arrays derived from a score (such as
+    its playback render) can be stored alongside it with put_arrays(), keyed by a
+    format version as well, so they are recomputed when the code deriving them
+    changes. Least recently used entries are evicted once the cache grows past
+    max_bytes.
+    """
+
+    extension = '.m21p'
+    arrays_extension = '.npz'
+
+    def __init__(self, cache_dir=None, max_bytes=512 * 1024 * 1024):
+        self.cache_dir = cache_dir or os.path.join(
+            os.path.expanduser('~'), '.cache', 'computational-music', 'scores')
+        self.max_bytes = max_bytes
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def file_hash(self, file_path):
+        """Return the hex SHA-256 digest of a file's contents."""
+        digest = hashlib.sha256()
+        with open(file_path, 'rb') as f:
+            for block in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(block)
+        return digest.hexdigest()
+
+    def entry_path(self, content_hash):
+        return os.path.join(
+            self.cache_dir, f"{content_hash}-{music21.VERSION_STR}{self.extension}")
+
+    def arrays_path(self, content_hash, name, version):
+        return os.path.join(
+            self.cache_dir, f"{content_hash}-{music21.VERSION_STR}.{name}-v{version}{self.arrays_extension}")
+
+    def get_arrays(self, file_path, name, version):
+        """Return the dict of arrays stored under name and format version for file_path, or None on a miss."""
+        path = self.arrays_path(self.file_hash(file_path), name, version)
+        try:
+            with np.load(path) as data:
+                arrays = {key: data[key] for key in data.files}
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            print(f"Discarding unreadable cache entry {path}: {e}")
+            self._remove(path)
+            return None
+        os.utime(path)
+        return arrays
+
+    def put_arrays(self, file_path, name, version, arrays):
+        """Store a dict of arrays under name and format version for file_path."""
+        path = self.arrays_path(self.file_hash(file_path), name, version)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, **arrays)
+        os.replace(tmp_path, path)
+        self.evict()
+
+    def get(self, file_path):
+        """Return the cached score for file_path, or None on a miss."""
+        path = self.entry_path(self.file_hash(file_path))
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            return None
+        try:
+            thawer = freezeThaw.StreamThawer()
+            thawer.openStr(data)
+        except Exception as e:
+            # A truncated or incompatible entry is treated as a miss
+            print(f"Discarding unreadable cache entry {path}: {e}")
+            self._remove(path)
+            return None
+        os.utime(path)  # Mark as most recently used
+        return thawer.stream
+
+    def put(self, file_path, score):
+        """Freeze score and store it as the entry for file_path."""
+        path = self.entry_path(self.file_hash(file_path))
+        data = freezeThaw.StreamFreezer(score).writeStr(fmt='pickle')
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)  # Atomic, so readers never see half an entry
+        self.evict()
+
+    def load(self, file_path):
+        """Return the notated score for file_path, parsing it only on a cache miss."""
+        score = self.get(file_path)
+        if score is None:
+            score = converter.parse(file_path).makeNotation()
+            self.put(file_path, score)
+        return score
+
+    def invalidate(self, file_path):
+        """Drop every cached entry (any music21 version) for file_path's current contents."""
+        content_hash = self.file_hash(file_path)
+        for name in os.listdir(self.cache_dir):
+            if name.startswith(content_hash) and name.endswith((self.extension, self.arrays_extension)):
+                self._remove(os.path.join(self.cache_dir, name))
+
+    def clear(self):
+        """Remove all cached entries."""
+        for path, _, _ in self._entries():
+            self._remove(path)
+
+    def evict(self):
+        """Delete least recently used entries until the cache fits in max_bytes."""
+        entries = sorted(self._entries(), key=lambda entry: entry[1])
+        total = sum(size for _, _, size in entries)
+        for path, _, size in entries:
+            if total <= self.max_bytes:
+                break
+            self._remove(path)
+            total -= size
+
+    def _entries(self):
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith((self.extension, self.arrays_extension)):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((path, stat.st_mtime, stat.st_size))
+        return entries
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,97 @@
+import copy
+import queue
+import threading
+from music21 import converter
+from event_table import EventTable
+
+
+class LoadCancelled(Exception):
+    pass
+
+
+class ScoreLoadJob:
+    """Loads, notates and analyzes a score on a background thread.
+
+    Progress and results are posted as (kind, payload) tuples to self.messages,
+    which the Tk side drains from its own loop with poll(); the worker thread
+    never touches Tk. Kinds, in order:
+
+        ('stage', name)         a stage from STAGES has started
+        ('score', score)        the parsed score is usable (playback can start); the worker
+                                notates a copy of it, so the UI may use it freely
+        ('notated', score)      the makeNotation() version of the score, which replaces it
+        ('analysis', analysis)  ScoreAnalysis from the single-pass analyzer
+        ('catalog', map)        instrument name -> list of parts
+        ('events', table)       EventTable of the score
+        ('done', None) / ('cancelled', None) / ('error', exception)
+
+    cancel() takes effect at the next stage boundary; a music21 parse in
+    progress cannot be interrupted.
+    """
+
+    STAGES = ('parse', 'notation', 'analysis', 'catalog', 'events', 'cache')
+
+    def __init__(self, file_path, score_cache, score_analyzer):
+        self.file_path = file_path
+        self.score_cache = score_cache
+        self.score_analyzer = score_analyzer
+        self.messages = queue.Queue()
+        self.cancelled = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def cancel(self):
+        self.cancelled.set()
+
+    def is_running(self):
+        return self.thread.is_alive()
+
+    def stage(self, name):
+        if self.cancelled.is_set():
+            raise LoadCancelled()
+        self.messages.put(('stage', name))
+
+    def run(self):
+        try:
+            self.stage('parse')
+            score = self.score_cache.get(self.file_path)
+            cached = score is not None
+            if not cached:
+                parsed = converter.parse(self.file_path)
+                # Copied before the UI gets the parsed score, so makeNotation() never walks a score in use
+                score = copy.deepcopy(parsed)
+                self.messages.put(('score', parsed))
+                self.stage('notation')
+                score.makeNotation(inPlace=True)
+            self.messages.put(('notated', score))
+
+            self.stage('analysis')
+            analysis = self.score_analyzer.analyze(score)
+            self.messages.put(('analysis', analysis))
+
+            self.stage('catalog')
+            self.messages.put(('catalog', analysis.instrument_stave_map))
+
+            self.stage('events')
+            self.messages.put(('events', EventTable.from_score(score, analysis.instrument_stave_map)))
+
+            if not cached:
+                self.stage('cache')
+                self.score_cache.put(self.file_path, score)
+            self.messages.put(('done', None))
+        except LoadCancelled:
+            self.messages.put(('cancelled', None))
+        except Exception as e:
+            self.messages.put(('error', e))
+
+    def poll(self):
+        """Return the messages posted since the last poll, without blocking."""
+        found = []
+        while True:
+            try:
+                found.append(self.messages.get_nowait())
+            except queue.Empty:
+                return found
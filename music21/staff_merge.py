@@ -0,0 +1,153 @@
+import numpy as np
+from music21 import chord, note, stream, tie
+from music21.common.numberTools import opFrac
+from event_table import TIE_START, TIE_CONTINUE, TIE_STOP
+
+
+def _exact_ranks(*arrays):
+    """Rank float offsets by their exact music21 values (opFrac), as chordify compares them.
+
+    Returns a rank array for each input array and the exact value of each
+    rank. Offsets that are equal as fractions get the same rank however
+    their floats were summed, e.g. 1/3 + 2/3 and 1.0.
+    """
+    floats = np.unique(np.concatenate(arrays))
+    exact = [opFrac(value) for value in floats.tolist()]
+    values = sorted(set(exact))
+    rank_of = {value: rank for rank, value in enumerate(values)}
+    float_ranks = np.array([rank_of[value] for value in exact], dtype='i8')
+    return [float_ranks[np.searchsorted(floats, a)] for a in arrays], values
+
+
+def sonorities(table, part_indices):
+    """Compute the vertical sonorities sounding across the given parts of an EventTable.
+
+    This is a sweep line over the onsets and ends of notes and rests and
+    over barlines, run measure by measure as chordify does. Every boundary
+    starts a new segment of its measure, and each note is expanded over the
+    segments it spans. A note that overruns its measure's end stays in that
+    measure, so it can overlap the start of the next one. Returns (starts,
+    ends, segments): segment i covers starts[i] to ends[i] (exact offsets)
+    and is a list of (midi, name, tie type) sorted by pitch, or an empty
+    list for silence. Segments are in score order.
+    """
+    events = table.events
+    selected = np.flatnonzero(np.isin(events['part'], part_indices))
+    if not len(selected):
+        return [], [], []
+    rows = events[selected]
+    rests = table.rests[np.isin(table.rests['part'], part_indices)]
+    # As in chordify, the first part's measures are the template; the last note or rest closes the last one
+    measure_starts = table.part_measure_offsets[min(part_indices)]
+    end = max((rows['onset'] + rows['duration']).max(), (rests['onset'] + rests['duration']).max(initial=0),
+              measure_starts.max(initial=0))
+    bounds = np.append(measure_starts, end)
+    (onsets, ends, rest_onsets, rest_ends, bounds), values = _exact_ranks(
+        rows['onset'], rows['onset'] + rows['duration'],
+        rests['onset'], rests['onset'] + rests['duration'], bounds)
+
+    # A boundary is keyed by (measure, offset rank). Notes and rests belong to the template measure they
+    # start in; measure 0 collects everything if the template has no measures
+    width = len(values)
+    note_measure = np.searchsorted(bounds[:-1], onsets, side='right').astype('i8')
+    rest_measure = np.searchsorted(bounds[:-1], rest_onsets, side='right').astype('i8')
+    measures = np.arange(len(bounds), dtype='i8')
+    barline_keys = np.concatenate((measures[1:] * width + bounds[:-1], measures[1:] * width + bounds[1:],
+                                   [bounds[-1]]))
+    onset_keys = note_measure * width + onsets
+    end_keys = note_measure * width + ends
+    points = np.unique(np.concatenate((onset_keys, end_keys, rest_measure * width + rest_onsets,
+                                       rest_measure * width + rest_ends, barline_keys)))
+    point_measure = points // width
+    point_value = points % width
+    # Point i starts a segment if point i + 1 is in the same measure
+    valid = point_measure[:-1] == point_measure[1:]
+
+    # Expand every note over the segments it spans; grace notes join the
+    # sonority that starts with them
+    first = np.searchsorted(points, onset_keys)
+    last = np.searchsorted(points, end_keys)
+    last = np.where(rows['duration'] == 0, np.minimum(first + 1, len(points) - 1), last)
+    counts = last - first
+    note_of = np.repeat(np.arange(len(rows)), counts)
+    segment = first[note_of] + np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+
+    # A note is tied into a segment it was already sounding in, and out of
+    # one it keeps sounding after; its own notated ties apply at its ends
+    original_tie = rows['tie'][note_of]
+    held_before = segment > first[note_of]
+    held_after = segment < last[note_of] - 1
+    tied_in = held_before | ((original_tie & (TIE_STOP | TIE_CONTINUE)) != 0)
+    tied_out = held_after | ((original_tie & (TIE_START | TIE_CONTINUE)) != 0)
+
+    # Sort by segment then pitch, and merge the same pitch sounding in two
+    # staves or voices into one note that is tied if either copy is
+    midi = rows['midi'][note_of]
+    order = np.lexsort((midi, segment))
+    is_first = np.ones(len(order), dtype=bool)
+    is_first[1:] = (segment[order][1:] != segment[order][:-1]) | (midi[order][1:] != midi[order][:-1])
+    group_starts = np.flatnonzero(is_first)
+    tied_in = np.logical_or.reduceat(tied_in[order], group_starts)
+    tied_out = np.logical_or.reduceat(tied_out[order], group_starts)
+    order = order[group_starts]
+
+    names = _pitch_names(table, selected)
+    segments = [[] for _ in range(len(points) - 1)]
+    for k, i in enumerate(order.tolist()):
+        if tied_in[k] and tied_out[k]:
+            tie_type = 'continue'
+        elif tied_out[k]:
+            tie_type = 'start'
+        elif tied_in[k]:
+            tie_type = 'stop'
+        else:
+            tie_type = None
+        segments[segment[i]].append((int(midi[i]), names[note_of[i]], tie_type))
+
+    # Consecutive silent segments within a measure make up a single rest
+    starts, ends, merged = [], [], []
+    for i in np.flatnonzero(valid).tolist():
+        opens_measure = not i or not valid[i - 1]
+        if segments[i] or opens_measure or segments[i - 1]:
+            starts.append(values[point_value[i]])
+            ends.append(values[point_value[i + 1]])
+            merged.append(segments[i])
+        else:
+            ends[-1] = values[point_value[i + 1]]
+    return starts, ends, merged
+
+
+def _pitch_names(table, rows):
+    """Spelled pitch names (nameWithOctave) for the given table rows."""
+    events = table.events
+    sizes = table.element_sizes()
+    element_starts = np.cumsum(sizes) - sizes
+    names = []
+    for row in rows.tolist():
+        element = table.elements[events['element'][row]]
+        if element.isChord:
+            names.append(element.pitches[row - element_starts[events['element'][row]]].nameWithOctave)
+        else:
+            names.append(element.pitch.nameWithOctave)
+    return names
+
+
+def merge_staves(table, part_indices):
+    """Merge the given parts into a single Part of chords, equivalent to chordify().
+
+    Silent segments become rests and notes held across a segment boundary
+    carry start/continue/stop ties, as in chordify's output.
+    """
+    merged = stream.Part()
+    for start, end, pitches in zip(*sonorities(table, part_indices)):
+        quarter_length = opFrac(end - start)
+        if not pitches:
+            merged.coreInsert(start, note.Rest(quarterLength=quarter_length))
+            continue
+        sonority = chord.Chord([name for _, name, _ in pitches], quarterLength=quarter_length)
+        for n, (_, _, tie_type) in zip(sonority.notes, pitches):
+            if tie_type:
+                n.tie = tie.Tie(tie_type)
+        merged.coreInsert(start, sonority)
+    merged.coreElementsChanged()
+    return merged
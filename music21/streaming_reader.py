@@ -0,0 +1,203 @@
+import zipfile
+import xml.etree.ElementTree as ET
+import numpy as np
+from event_table import EVENT_DTYPE, DEFAULT_VELOCITY, TIE_START, TIE_STOP, TIE_CONTINUE
+
+STEP_PITCH_CLASSES = {'C': 0, 'D': 2, 'E': 4, 'F': 5, 'G': 7, 'A': 9, 'B': 11}
+
+
+class MeasureChunk:
+    """The decoded notes of one measure of one part, as EVENT_DTYPE rows.
+
+    Event 'element' numbers are unique across the whole file, so the notes of
+    a chord share one; there are no music21 objects behind them.
+    """
+
+    def __init__(self, part_id, part_name, part_index, measure_index, number, offset, duration,
+                 events, tempos):
+        self.part_id = part_id
+        self.part_name = part_name
+        self.part_index = part_index
+        self.measure_index = measure_index
+        self.number = number
+        self.offset = offset
+        self.duration = duration
+        self.events = events
+        self.tempos = tempos  # (offset, quarter-note BPM) from <sound tempo="...">
+
+    def __repr__(self):
+        return f"<MeasureChunk {self.part_id} m.{self.number} offset={self.offset} notes={len(self.events)}>"
+
+
+def open_musicxml(file_path):
+    """Open the score document of a .mxl archive or a plain MusicXML file as a binary stream."""
+    if not zipfile.is_zipfile(file_path):
+        return open(file_path, 'rb')
+    archive = zipfile.ZipFile(file_path)
+    member = None
+    try:
+        container = ET.fromstring(archive.read('META-INF/container.xml'))
+        rootfile = container.find('.//{*}rootfile')
+        if rootfile is not None:
+            member = rootfile.get('full-path')
+    except KeyError:
+        pass
+    if member is None:
+        member = next(name for name in archive.namelist()
+                      if name.endswith(('.xml', '.musicxml')) and not name.startswith('META-INF'))
+    return archive.open(member)
+
+
+def iter_measures(file_path):
+    """Yield a MeasureChunk for every measure of a partwise MusicXML file, as soon as it is decoded.
+
+    Uses incremental XML parsing and discards each measure's elements once
+    decoded, so memory stays bounded by one measure regardless of score
+    length. Measures arrive in document order: all of the first part, then
+    all of the second, and so on.
+
+    Offsets follow the file's <duration> values, with the same empty and
+    overfull measure corrections as music21's importer. Unlike music21,
+    whole-measure rests are not stretched to a 4/4 bar in parts that have
+    no time signature.
+    """
+    part_names = {}
+    part_index = -1
+    part_elem = None
+    element_count = 0
+    with open_musicxml(file_path) as f:
+        context = ET.iterparse(f, events=('start', 'end'))
+        for event, elem in context:
+            tag = elem.tag
+            if event == 'start':
+                if tag == 'score-timewise':
+                    raise ValueError("Timewise MusicXML is not supported by the streaming reader")
+                if tag == 'part' and part_elem is None:
+                    part_index += 1
+                    part_elem = elem
+                    part = _PartState(elem.get('id'), part_names.get(elem.get('id')), part_index)
+                continue
+
+            if tag == 'score-part':
+                name = elem.find('part-name')
+                part_names[elem.get('id')] = name.text if name is not None else None
+            elif tag == 'measure' and part_elem is not None:
+                chunk, element_count = part.decode_measure(elem, element_count)
+                part_elem.remove(elem)  # Only the current measure is ever held in memory
+                yield chunk
+            elif tag == 'part' and elem is part_elem:
+                part_elem = None
+                elem.clear()
+
+
+def iter_chords(file_path, min_notes=2):
+    """Yield (part index, onset, MIDI tuple) for every chord of at least min_notes pitches, in document order."""
+    for chunk in iter_measures(file_path):
+        events = chunk.events
+        if not len(events):
+            continue
+        _, starts, counts = np.unique(events['element'], return_index=True, return_counts=True)
+        for start, count in zip(starts[counts >= min_notes], counts[counts >= min_notes]):
+            rows = events[start:start + count]
+            yield chunk.part_index, float(rows['onset'][0]), tuple(int(m) for m in rows['midi'])
+
+
+class _PartState:
+    """Divisions and running offset of the part currently being decoded."""
+
+    def __init__(self, part_id, part_name, part_index):
+        self.part_id = part_id
+        self.part_name = part_name
+        self.part_index = part_index
+        self.divisions = 1
+        self.bar_length = 4.0  # Quarter lengths per bar under the current time signature
+        self.offset = 0.0
+        self.measure_index = 0
+
+    def decode_measure(self, measure, element_count):
+        rows = []
+        tempos = []
+        position = 0.0  # Quarter lengths from the start of the measure
+        measure_length = 0.0
+        last_onset = 0.0
+        has_notes = False
+        for child in measure:
+            tag = child.tag
+            if tag == 'attributes':
+                divisions = child.find('divisions')
+                if divisions is not None:
+                    self.divisions = float(divisions.text)
+                time = child.find('time')
+                if time is not None and time.find('beats') is not None:
+                    beats = sum(float(b) for b in time.findtext('beats').split('+'))
+                    self.bar_length = beats * 4.0 / float(time.findtext('beat-type'))
+            elif tag == 'backup':
+                position -= self._quarters(child)
+            elif tag == 'forward':
+                position += self._quarters(child)
+            elif tag in ('direction', 'sound'):
+                sound = child if tag == 'sound' else child.find('sound')
+                if sound is not None and sound.get('tempo'):
+                    tempos.append((self.offset + position, float(sound.get('tempo'))))
+            elif tag == 'note':
+                has_notes = True
+                is_grace = child.find('grace') is not None
+                in_chord = child.find('chord') is not None
+                duration = 0.0 if is_grace else self._quarters(child)
+                onset = last_onset if in_chord else position
+                if not in_chord:
+                    element_count += 1
+                    position += duration
+                last_onset = onset
+                pitch = child.find('pitch')
+                if pitch is not None:
+                    rows.append((
+                        self.offset + onset, duration, self._midi(pitch), DEFAULT_VELOCITY,
+                        self.part_index, int(child.findtext('staff', '1')) - 1, self.measure_index,
+                        self._tie_flags(child), element_count - 1, False,
+                    ))
+            measure_length = max(measure_length, position)
+
+        events = np.array(rows, dtype=EVENT_DTYPE)
+        if len(events):
+            # Mark the rows of elements with more than one pitch as chords
+            sizes = np.bincount(events['element'] - events['element'].min())
+            events['chord'] = sizes[events['element'] - events['element'].min()] > 1
+        measure_length = self._measure_length(measure_length, has_notes)
+        chunk = MeasureChunk(self.part_id, self.part_name, self.part_index, self.measure_index,
+                             measure.get('number'), self.offset, measure_length, events, tempos)
+        self.offset += measure_length
+        self.measure_index += 1
+        return chunk, element_count
+
+    def _measure_length(self, content_length, has_notes):
+        # The same corrections music21's MusicXML importer makes, so offsets
+        # agree with the parsed score: empty measures last a full bar, and
+        # ones overfull by an odd sliver are taken to be a full bar
+        if not has_notes and content_length == 0.0:
+            return self.bar_length
+        excess = content_length - self.bar_length
+        if 0 < excess <= 0.5 and not (_near_multiple(excess, 0.0625) or _near_multiple(excess, 1 / 12)):
+            return self.bar_length
+        return content_length
+
+    def _quarters(self, elem):
+        duration = elem.find('duration')
+        return float(duration.text) / self.divisions if duration is not None else 0.0
+
+    @staticmethod
+    def _midi(pitch):
+        alter = float(pitch.findtext('alter', '0'))
+        octave = int(pitch.findtext('octave'))
+        return (octave + 1) * 12 + STEP_PITCH_CLASSES[pitch.findtext('step')] + int(round(alter))
+
+    @staticmethod
+    def _tie_flags(note):
+        types = {tie.get('type') for tie in note.findall('tie')}
+        if types == {'start', 'stop'}:
+            return TIE_CONTINUE
+        return (TIE_START if 'start' in types else 0) | (TIE_STOP if 'stop' in types else 0)
+
+
+def _near_multiple(value, unit, tolerance=1e-6):
+    return abs(value - round(value / unit) * unit) < tolerance
@@ -0,0 +1,91 @@
+"""Measure OSC latency through the whole key chain on this machine.
+
+Stands in for each app on loopback ports. An origin sends traced /keyOn
+messages, like Music21Module does through the sound engine. A hop forwards
+them the way PianoApp does. A real KeyboardListener receives them. The
+listener's histograms are then fetched over /trace/query, as any peer can:
+
+    python trace_loopback.py --count 2000 --rate 500
+"""
+import argparse
+import contextlib
+import io
+import socket
+import sys
+import time
+from pythonosc.dispatcher import Dispatcher
+from pythonosc.osc_message import OscMessage
+from pythonosc.osc_message_builder import OscMessageBuilder
+from keyboard_listener import KeyboardListener
+from osc_engine import OscEngine
+from osc_trace import LatencyTracer, split_trace
+
+
+def start_forwarder(engine, port, listener_port):
+    """Serve a PianoApp-like hop on port, forwarding /keyOn to the listener; returns its tracer."""
+    tracer = LatencyTracer('piano', engine)
+    sender = engine.sender('127.0.0.1', listener_port)
+
+    def key_on_handler(address, *args):
+        payload, trace = split_trace(args, 2)
+        tracer.receive('music21->piano', trace)
+        sender.send_message("/keyOn", [payload[1]] + tracer.forward(trace))
+
+    dispatcher = Dispatcher()
+    dispatcher.map("/keyOn", key_on_handler)
+    engine.serve('127.0.0.1', port, dispatcher)
+    return tracer
+
+
+def query(port, timeout=2.0):
+    """Ask the tracer serving on port for its histograms: {hop: (count, p50, p99, max)} in µs."""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.bind(('127.0.0.1', 0))  # The report is sent back to this address
+    sock.settimeout(timeout)
+    try:
+        sock.sendto(OscMessageBuilder("/trace/query").build().dgram, ('127.0.0.1', port))
+        values = OscMessage(sock.recv(65536)).params
+    finally:
+        sock.close()
+    return {values[i]: tuple(values[i + 1:i + 5]) for i in range(0, len(values), 5)}
+
+
+def print_summary(name, summary):
+    print(f"{name}:")
+    for hop, (count, p50, p99, worst) in summary.items():
+        print(f"  {hop}: n={count} p50={p50 / 1000:.3f}ms p99={p99 / 1000:.3f}ms max={worst / 1000:.3f}ms")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure OSC latency through a local copy of the key chain.")
+    parser.add_argument('--count', type=int, default=1000, help="Messages to send")
+    parser.add_argument('--rate', type=float, default=200.0, help="Messages per second")
+    parser.add_argument('--chord-size', type=int, default=4, help="Notes sent together, forming one chord")
+    parser.add_argument('--piano-port', type=int, default=57131)
+    parser.add_argument('--listener-port', type=int, default=50010)
+    args = parser.parse_args(argv)
+
+    engine = OscEngine.shared()
+    chord_duration = 0.02
+    with contextlib.redirect_stdout(io.StringIO()):  # The listener prints every note
+        listener = KeyboardListener(args.listener_port, chord_duration, engine, trace_dump_interval=None)
+        listener.start_listening()
+        piano = start_forwarder(engine, args.piano_port, args.listener_port)
+        origin = LatencyTracer('music21')
+        sender = engine.sender('127.0.0.1', args.piano_port)
+        interval = args.chord_size / args.rate
+        start = time.monotonic()
+        for sent in range(0, args.count, args.chord_size):
+            for midi in range(60, 60 + min(args.chord_size, args.count - sent)):
+                sender.send_message("/keyOn", [0, midi] + origin.stamp())
+            # Leave a gap after each chord so the listener finalizes it
+            time.sleep(max(start + (sent // args.chord_size + 1) * interval - time.monotonic(), chord_duration * 2))
+        time.sleep(chord_duration * 2 + 0.1)
+
+    print_summary('piano (local)', piano.summary())
+    print_summary('keyboard_listener (via /trace/query)', query(args.listener_port))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
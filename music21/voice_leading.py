@@ -0,0 +1,119 @@
+import numpy as np
+
+BEND_CENTER = 8192
+BEND_RANGE = 12  # Semitones reached at full bend either way
+BEND_PER_SEMITONE = BEND_CENTER / BEND_RANGE
+
+
+def voice_motions(sources, targets):
+    """Minimal-movement voice leading for many chord pairs of the same sizes at once.
+
+    sources is a (pairs, m) and targets a (pairs, n) matrix of sorted MIDI
+    numbers. Returns a (pairs, max(m, n)) matrix of the semitones each voice
+    moves, one column per note of the larger chord, bottom to top.
+
+    Equal-size chords are paired bottom to top, which minimises the total
+    movement. When the sizes differ, every note of the larger chord is paired
+    with a note of the smaller one, each note of the smaller chord at least
+    once. The cheapest such pairing is found by dynamic programming, run for
+    all pairs together.
+    """
+    pairs, m = sources.shape
+    n = targets.shape[1]
+    if m == n:
+        return targets - sources
+    if not m or not n:
+        return np.zeros((pairs, 0), dtype=sources.dtype)
+    big, small = (sources, targets) if m > n else (targets, sources)
+    width, narrow = big.shape[1], small.shape[1]
+    rows = np.arange(pairs)
+    # cost[:, j] is the least total movement of the big notes so far, the last one paired with small note j
+    cost = np.full((pairs, narrow), np.inf)
+    cost[:, 0] = np.abs(big[:, 0] - small[:, 0])
+    # stepped[i][:, j] is True if big note i - 1 was paired with small note j - 1 rather than j
+    stepped = np.zeros((width, pairs, narrow), dtype=bool)
+    for i in range(1, width):
+        previous = cost
+        shifted = np.concatenate((np.full((pairs, 1), np.inf), previous[:, :-1]), axis=1)
+        stepped[i] = shifted < previous
+        cost = np.minimum(previous, shifted) + np.abs(big[:, i, None] - small)
+    assigned = np.empty((pairs, width), dtype=int)
+    j = np.full(pairs, narrow - 1)
+    for i in range(width - 1, -1, -1):
+        assigned[:, i] = j
+        j = j - stepped[i, rows, j]
+    paired = small[rows[:, None], assigned]
+    return paired - big if m > n else big - paired
+
+
+def bend_values(motions):
+    """Map semitone motions to pitch-bend values: -12..+12 semitones onto 0..16384."""
+    return np.rint(BEND_CENTER + motions * BEND_PER_SEMITONE).astype('i4')
+
+
+def morph_values(prev_midi, curr_midi):
+    """The /morphNotes values for moving from one chord to another, or [] if a voice would leap beyond the bend range."""
+    motions = voice_motions(np.sort(np.asarray(prev_midi, dtype='i4'))[None, :],
+                            np.sort(np.asarray(curr_midi, dtype='i4'))[None, :])[0]
+    if not len(motions) or np.any(np.abs(motions) > BEND_RANGE):
+        return []
+    return bend_values(motions).tolist()
+
+
+class MorphTable:
+    """The /morphNotes values of every step between consecutive chords, computed once for the whole list.
+
+    Steps are grouped by the sizes of their two chords, and each group is
+    voice-led in one voice_motions call. Step k moves from chord k to chord
+    k + 1. Its values are forward[starts[k]:starts[k + 1]], and those of the
+    reverse step are in backward. A step in which a voice would leap beyond
+    the bend range has no morph (valid[k] is False). The arrays are read-only.
+    """
+
+    def __init__(self, voicings):
+        """voicings is a list of sorted MIDI number sequences, one per chord."""
+        self.voicings = [np.asarray(v, dtype='i4') for v in voicings]
+        sizes = np.array([len(v) for v in self.voicings], dtype=int)
+        shapes = np.stack((sizes[:-1], sizes[1:]), axis=1)  # (previous size, next size) of each step
+        widths = np.where(shapes.min(axis=1, initial=1) > 0, shapes.max(axis=1, initial=0), 0)
+        self.starts = np.concatenate(([0], np.cumsum(widths))).astype(int)
+        motions = np.zeros(self.starts[-1], dtype='i4')
+        for m, n in np.unique(shapes, axis=0):
+            group = np.flatnonzero((shapes[:, 0] == m) & (shapes[:, 1] == n))
+            if not widths[group[0]]:
+                continue
+            sources = np.stack([self.voicings[k] for k in group])
+            targets = np.stack([self.voicings[k + 1] for k in group])
+            columns = np.arange(widths[group[0]])
+            motions[self.starts[group][:, None] + columns] = voice_motions(sources, targets)
+        leaps = np.abs(motions) > BEND_RANGE
+        self.valid = widths > 0
+        if len(motions):
+            self.valid &= ~np.logical_or.reduceat(leaps, np.minimum(self.starts[:-1], len(motions) - 1))
+        self.forward = bend_values(motions)
+        self.backward = 2 * BEND_CENTER - self.forward
+        for array in (self.starts, self.valid, self.forward, self.backward):
+            array.setflags(write=False)
+
+    @classmethod
+    def from_chords(cls, chords):
+        return cls([sorted(p.midi for p in c.pitches) for c in chords])
+
+    def __len__(self):
+        """Number of steps, one fewer than the number of chords."""
+        return len(self.valid)
+
+    def values(self, previous, index):
+        """The /morphNotes values for moving from chord previous to chord index, or [] if there is no morph.
+
+        Steps between neighbours come from the table; others are computed.
+        """
+        if index == previous + 1:
+            step, values = previous, self.forward
+        elif index == previous - 1:
+            step, values = index, self.backward
+        else:
+            return morph_values(self.voicings[previous], self.voicings[index])
+        if not self.valid[step]:
+            return []
+        return values[self.starts[step]:self.starts[step + 1]].tolist()